@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+# Incremental backup of the dotfiles into this repo. Files whose size and
+# mtime match the manifest from the last run are skipped without being
+# read; everything else is hashed (in parallel) and only copied when its
+# content differs from what the repo already has.
+#
+#   ./backup.py             # back up and report bytes scanned / copied
+#   ./backup.py --dry-run   # only list what would be copied
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HOME = os.path.expanduser('~')
+REPO = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = os.path.join(REPO, '.backup-manifest.json')
+
+# (source, destination in the repo)
+SOURCES = [
+    (os.path.join(HOME, '.config', 'dunst'), 'config/dunst'),
+    (os.path.join(HOME, '.config', 'kitty'), 'config/kitty'),
+    (os.path.join(HOME, '.config', 'nvim'), 'config/nvim'),
+    (os.path.join(HOME, '.config', 'picom'), 'config/picom'),
+    (os.path.join(HOME, '.config', 'qtile'), 'config/qtile'),
+    (os.path.join(HOME, '.config', 'rofi'), 'config/rofi'),
+    (os.path.join(HOME, '.local', 'bin', 'scripts'), 'scripts'),
+]
+
+# Matched against every file and directory name on the way down
+EXCLUDE = [
+    'Cache', 'GPUCache', 'Code Cache', 'CachedData', 'Crashpad',
+    '__pycache__', '*.pyc', '.git', '*.swp', '*~',
+]
+
+CHUNK = 1 << 20
+
+
+def _matcher(patterns):
+    return re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns)).match
+
+
+# (path, path relative to source, stat) of every file not excluded
+
+def walk(source, patterns=EXCLUDE):
+    excluded = _matcher(patterns)
+    pending = ['']
+    while pending:
+        relative = pending.pop()
+        try:
+            entries = list(os.scandir(os.path.join(source, relative)))
+        except OSError:
+            continue
+        for entry in entries:
+            if excluded(entry.name):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(relative + entry.name + os.sep)
+                elif entry.is_file():
+                    yield entry.path, relative + entry.name, entry.stat()
+            except OSError:
+                continue
+
+
+def digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(path=MANIFEST):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class Backup:
+
+    def __init__(self, sources=SOURCES, repo=REPO, manifest=MANIFEST,
+                 exclude=EXCLUDE, workers=None, dry_run=False):
+        self.sources = sources
+        self.repo = repo
+        self.manifest_path = manifest
+        self.exclude = exclude
+        self.workers = workers or min(8, (os.cpu_count() or 1) * 2)
+        self.dry_run = dry_run
+        self.stats = {'files': 0, 'scanned': 0, 'hashed': 0, 'copied': 0, 'copied_files': 0}
+
+    # Files that need hashing: new ones, and ones whose size or mtime
+    # changed since the manifest was written or whose copy went missing
+
+    def _candidates(self, manifest):
+        for source, destination in self.sources:
+            if not os.path.isdir(source):
+                print("skipping missing", source, file=sys.stderr)
+                continue
+            for path, relative, st in walk(source, self.exclude):
+                key = os.path.join(destination, relative)
+                self.stats['files'] += 1
+                self.stats['scanned'] += st.st_size
+                entry = manifest.get(key)
+                if (entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns
+                        and os.path.exists(os.path.join(self.repo, key))):
+                    continue
+                yield path, key, st
+
+    def _check(self, item, manifest):
+        path, key, st = item
+        content = digest(path)
+        target = os.path.join(self.repo, key)
+        entry = manifest.get(key)
+        if entry is not None and entry[2] == content and os.path.exists(target):
+            changed = False
+        elif os.path.exists(target) and os.path.getsize(target) == st.st_size:
+            changed = digest(target) != content
+        else:
+            changed = True
+        return path, key, st, content, changed
+
+    def run(self):
+        manifest = load_manifest(self.manifest_path)
+        candidates = list(self._candidates(manifest))
+        with ThreadPoolExecutor(self.workers) as pool:
+            results = list(pool.map(lambda item: self._check(item, manifest), candidates))
+
+        for path, key, st, content, changed in results:
+            self.stats['hashed'] += st.st_size
+            if changed:
+                self.stats['copied'] += st.st_size
+                self.stats['copied_files'] += 1
+                print(("would copy " if self.dry_run else "") + key)
+                if not self.dry_run:
+                    target = os.path.join(self.repo, key)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copy2(path, target)
+            if not self.dry_run:
+                manifest[key] = [st.st_size, st.st_mtime_ns, content]
+
+        if results and not self.dry_run:
+            save_manifest(manifest, self.manifest_path)
+        return self.stats
+
+
+# The explicitly installed package list, rewritten only when it changed
+
+def backup_packages(path=os.path.join(REPO, 'packages'), dry_run=False):
+    try:
+        out = subprocess.run(['paru', '-Qetq'], stdout=subprocess.PIPE, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        print("can't list packages:", e, file=sys.stderr)
+        return False
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == out:
+                return False
+    except OSError:
+        pass
+    if not dry_run:
+        with open(path, 'wb') as f:
+            f.write(out)
+    return True
+
+
+def size(n):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if n < 1024 or unit == 'GiB':
+            return ("%d %s" if unit == 'B' else "%.1f %s") % (n, unit)
+        n /= 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dry-run', action='store_true', help="only list what would be copied")
+    parser.add_argument('--no-packages', action='store_true', help="don't update the package list")
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = Backup(workers=args.workers, dry_run=args.dry_run).run()
+    if not args.no_packages and backup_packages(dry_run=args.dry_run):
+        print(("would update " if args.dry_run else "") + "packages")
+    print("%d files, %s scanned, %s hashed, %s in %d files copied, %.0f ms" % (
+        stats['files'], size(stats['scanned']), size(stats['hashed']),
+        size(stats['copied']), stats['copied_files'], (time.perf_counter() - start) * 1000))
+
+
+if __name__ == '__main__':
+    main()
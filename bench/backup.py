@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Benchmark for backup.py on a generated tree: the first full copy, a run
+# with nothing changed, a run after touching files without changing them,
+# and a run after editing one file.
+#
+#   python3 bench/backup.py [--files 5000] [--size 4096]
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backup import Backup  # noqa: E402
+
+
+def make_tree(root, files, size):
+    for i in range(files):
+        directory = os.path.join(root, 'config', 'd%02d' % (i % 50))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'f%05d' % i), 'wb') as f:
+            f.write(os.urandom(size))
+    # should never be scanned
+    cache = os.path.join(root, 'config', 'Cache')
+    os.makedirs(cache)
+    with open(os.path.join(cache, 'data_0'), 'wb') as f:
+        f.write(os.urandom(size * 100))
+
+
+def timed_run(label, source, repo, manifest):
+    backup = Backup(sources=[(source, 'config')], repo=repo, manifest=manifest)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            stats = backup.run()
+        finally:
+            sys.stdout = stdout
+    took = time.perf_counter() - start
+    print("%-12s %9.1f ms %6d files %11d B scanned %11d B hashed %11d B copied" % (
+        label, took * 1000, stats['files'], stats['scanned'], stats['hashed'], stats['copied']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=5000)
+    parser.add_argument('--size', type=int, default=4096)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='backup-bench-')
+    try:
+        source = os.path.join(tmp, 'home')
+        repo = os.path.join(tmp, 'repo')
+        manifest = os.path.join(tmp, 'manifest.json')
+        make_tree(source, args.files, args.size)
+        os.makedirs(repo)
+
+        timed_run('first', source, repo, manifest)
+        timed_run('no change', source, repo, manifest)
+        for directory, _, files in os.walk(source):
+            for name in files[:10]:
+                os.utime(os.path.join(directory, name))
+        timed_run('touched', source, repo, manifest)
+        with open(os.path.join(source, 'config', 'd00', 'f00000'), 'ab') as f:
+            f.write(b'changed')
+        timed_run('one edit', source, repo, manifest)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+# Headless benchmark for config/qtile/config.py. Starts Xvfb and qtile with
+# the config and stubbed helper scripts, drives scripted workloads over
+# qtile's IPC socket and reports the numbers collected by the config's own
+# instrumentation (QTILE_INSTRUMENT=1).
+#
+#   python3 bench/headless.py                  # run and compare to baselines
+#   python3 bench/headless.py --save-baseline  # run and store as baselines
+#   python3 bench/headless.py --windows 50 --idle 10
+#
+# Without bench/baselines.json the first run is stored as the baselines.
+# Needs Xvfb, qtile and xcffib.
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONFIG = os.path.join(HERE, '..', 'config', 'qtile', 'config.py')
+BASELINES = os.path.join(HERE, 'baselines.json')
+
+# Helper scripts and tools the config calls, answering instantly
+STUBS = {
+    'scripts/screenlayout.sh': 'true',
+    'bin/paru': 'exit 1',
+    'bin/pamixer': 'echo 50 false',
+    'bin/nmcli': 'true',
+    'bin/dunstify': 'true',
+    'bin/notify-send': 'true',
+}
+
+# One window class per workspace match in the config
+WM_CLASSES = ['firefox', 'kitty', 'code', 'kodi', 'gimp', 'spotify', 'zathura',
+              'retroarch', 'discord']
+
+
+def make_home(home):
+    for name, body in STUBS.items():
+        directory = 'bin' if name.startswith('bin/') else '.local/bin/scripts'
+        path = os.path.join(home, directory, os.path.basename(name))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write('#!/bin/sh\n' + body + '\n')
+        os.chmod(path, 0o755)
+    autostart = os.path.join(home, '.config', 'qtile', 'autostart.sh')
+    os.makedirs(os.path.dirname(autostart), exist_ok=True)
+    with open(autostart, 'w') as f:
+        f.write('#!/bin/sh\n')
+    os.chmod(autostart, 0o755)
+
+
+def free_display():
+    for n in range(90, 200):
+        if not os.path.exists('/tmp/.X11-unix/X%d' % n) and not os.path.exists('/tmp/.X%d-lock' % n):
+            return ':%d' % n
+    raise RuntimeError("no free display")
+
+
+def wait_for(predicate, timeout=20, what="condition"):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return
+        time.sleep(0.05)
+    raise RuntimeError("timed out waiting for " + what)
+
+
+class Session:
+
+    def __init__(self, resolution):
+        self.resolution = resolution
+        self.tmp = tempfile.mkdtemp(prefix='qtile-bench-')
+        self.home = os.path.join(self.tmp, 'home')
+        self.display = free_display()
+        self.procs = []
+        self.clients = []
+
+    def __enter__(self):
+        make_home(self.home)
+        runtime = os.path.join(self.tmp, 'run')
+        os.makedirs(runtime, mode=0o700)
+        self.env = dict(
+            os.environ, HOME=self.home, DISPLAY=self.display, QTILE_INSTRUMENT='1',
+            XDG_RUNTIME_DIR=runtime, XDG_CACHE_HOME=os.path.join(self.tmp, 'cache'),
+            PATH=os.path.join(self.home, 'bin') + os.pathsep + os.environ['PATH'])
+
+        xvfb = ['Xvfb', self.display, '-nolisten', 'tcp', '+extension', 'RANDR',
+                '-screen', '0', self.resolution + 'x24']
+        self.procs.append(subprocess.Popen(xvfb, stderr=subprocess.DEVNULL))
+        wait_for(lambda: os.path.exists('/tmp/.X11-unix/X' + self.display[1:]), what="Xvfb")
+
+        self.qtile = subprocess.Popen(
+            ['qtile', 'start', '-b', 'x11', '-c', os.path.abspath(CONFIG)],
+            env=self.env, stderr=open(os.path.join(self.tmp, 'qtile.log'), 'w'))
+        self.procs.append(self.qtile)
+
+        os.environ.update(XDG_CACHE_HOME=self.env['XDG_CACHE_HOME'], DISPLAY=self.display)
+        from libqtile.command.client import InteractiveCommandClient
+        from libqtile.command.interface import IPCCommandInterface
+        from libqtile.ipc import Client, find_sockfile
+
+        sockfile = find_sockfile(self.display)
+        wait_for(lambda: os.path.exists(sockfile), what="qtile IPC socket")
+        self.client = InteractiveCommandClient(IPCCommandInterface(Client(sockfile)))
+        wait_for(self._responds, what="qtile to answer")
+        return self
+
+    def _responds(self):
+        try:
+            return self.client.status() == 'OK'
+        except Exception:
+            return False
+
+    def __exit__(self, *exc):
+        for proc in self.clients + self.procs[::-1]:
+            proc.terminate()
+        for proc in self.clients + self.procs:
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    # Evaluate an expression inside qtile (self is the Qtile object there)
+
+    def eval(self, code):
+        ok, result = self.client.eval(code)
+        if not ok:
+            raise RuntimeError(result)
+        return result
+
+    def report(self):
+        return json.loads(self.eval("__import__('json').dumps(__import__('instrument').report())"))
+
+    def window_count(self):
+        return len(self.client.windows())
+
+    def open_window(self, wm_class):
+        self.clients.append(subprocess.Popen(
+            [sys.executable, os.path.join(HERE, 'xclient.py'), wm_class], env=self.env))
+
+    def close_windows(self):
+        for proc in self.clients:
+            proc.terminate()
+            proc.wait()
+        self.clients = []
+
+    def cpu_seconds(self):
+        with open('/proc/%d/stat' % self.qtile.pid) as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def run_workloads(session, args):
+    results = {}
+
+    # Open windows across all workspace matches, then close them again
+    start = time.perf_counter()
+    for i in range(args.windows):
+        session.open_window(WM_CLASSES[i % len(WM_CLASSES)])
+    wait_for(lambda: session.window_count() >= args.windows, timeout=60, what="windows")
+    results['open_windows_s'] = time.perf_counter() - start
+    time.sleep(0.5)
+    start = time.perf_counter()
+    session.close_windows()
+    wait_for(lambda: session.window_count() == 0, timeout=60, what="windows to close")
+    results['close_windows_s'] = time.perf_counter() - start
+
+    # Group switches, timed over IPC
+    groups = [g for g in session.client.groups() if g != 'scratchpad']
+    start = time.perf_counter()
+    for i in range(args.switches):
+        session.client.group[groups[i % len(groups)]].toscreen()
+    results['group_switch_ms'] = (time.perf_counter() - start) / args.switches * 1000
+
+    # Screen change, handled by the set_screens hook
+    for _ in range(args.screen_changes):
+        session.eval("__import__('libqtile.hook', fromlist=['fire']).fire('screen_change', None)")
+
+    # Hammer the volume keys like a held key would
+    for _ in range(args.key_presses):
+        session.client.simulate_keypress([], 'XF86AudioRaiseVolume')
+    time.sleep(0.5)
+
+    # Bar redraw, timed inside qtile
+    results['bar_redraw_ms'] = float(session.eval(
+        "__import__('timeit').timeit(lambda: [s.top._actual_draw() for s in self.screens "
+        "if s.top], number=100) * 10"))
+
+    # Idle CPU
+    cpu = session.cpu_seconds()
+    time.sleep(args.idle)
+    results['idle_cpu_s_per_min'] = (session.cpu_seconds() - cpu) * 60 / args.idle
+
+    report = session.report()
+    latency = report['latency']
+    placement = report['stats'].get('placement', {})
+    if placement.get('count'):
+        results['client_new_to_focus_ms'] = placement['mean'] * 1000
+        results['client_new_to_focus_p95_ms'] = placement['p95'] * 1000
+    for name, key in [('hook:client_killed:fallback', 'fallback_ms'),
+                      ('hook:client_new:modify_window', 'modify_window_ms'),
+                      ('hook:screen_change:set_screens', 'screen_change_ms')]:
+        if latency.get(name, {}).get('count'):
+            results[key] = latency[name]['mean_ms']
+    results['keys_merged'] = report['stats'].get('keys', {}).get('merged', 0)
+    bar_stats = report['stats'].get('bar', {})
+    if bar_stats:
+        results['widget_redraws_skipped'] = bar_stats['skipped']
+        results['bar_bytes_to_x_per_min'] = bar_stats['bytes_to_x_per_min']
+    results['loop_stalls'] = len(report['stalls'])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--windows', type=int, default=20)
+    parser.add_argument('--switches', type=int, default=200)
+    parser.add_argument('--screen-changes', type=int, default=5)
+    parser.add_argument('--key-presses', type=int, default=30)
+    parser.add_argument('--idle', type=float, default=60, help="seconds of idle CPU sampling")
+    parser.add_argument('--resolution', default='1920x1080')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    with Session(args.resolution) as session:
+        results = run_workloads(session, args)
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+
+    print("%-28s %12s %12s %8s" % ("metric", "value", "baseline", "change"))
+    for name, value in results.items():
+        base = baselines.get(name)
+        change = "%+7.1f%%" % ((value - base) * 100 / base) if base else ""
+        print("%-28s %12.3f %12s %8s" % (name, value, "%.3f" % base if base is not None else "-", change))
+
+    if args.save_baseline or not baselines:
+        with open(BASELINES, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print("baselines saved to", os.path.relpath(BASELINES))
+
+
+if __name__ == '__main__':
+    main()
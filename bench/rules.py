@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# Micro-benchmark: match a window against N rules with Match.compare() one
+# by one versus the compiled RuleIndex from config/qtile/rules.py. Before
+# timing, both are checked to agree, also on windows that only match
+# because Match compares strings as an include match (an empty title, a
+# class that is part of a rule's class).
+#
+#   python3 bench/rules.py [--rules 10 100 1000] [--windows 2000]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'config', 'qtile'))
+
+from libqtile.config import Match  # noqa: E402
+
+from rules import RuleIndex  # noqa: E402
+
+
+class FakeClient:
+
+    def __init__(self, wm_class, name, wm_type='normal'):
+        self.wm_class = [wm_class.lower(), wm_class]
+        self.name = name
+        self.wm_type = wm_type
+        self.wid = id(self)
+
+    def get_wm_class(self):
+        return self.wm_class
+
+    def get_wm_type(self):
+        return self.wm_type
+
+    def get_wm_role(self):
+        return None
+
+    def get_pid(self):
+        return None
+
+
+def make_rules(count):
+    rules = [('dialogs', Match(wm_type='dialog')), ('quit', Match(title='Quit and close tabs?'))]
+    for i in range(count - 2):
+        rules.append(('group%d' % i, Match(wm_class='app%d' % i)))
+    return rules
+
+
+# Windows whose values are a part of some rule's value, but none equal
+EDGE_CLIENTS = [
+    FakeClient('unknown', ''),
+    FakeClient('unknown', 'close tabs'),
+    FakeClient('App1', 'w'),
+    FakeClient('', 'w'),
+    FakeClient('unknown', 'w', wm_type='dia'),
+    FakeClient('unknown', None, wm_type=None),
+]
+
+
+def linear(rules, client):
+    for target, match in rules:
+        if match.compare(client):
+            return target
+    return None
+
+
+def timeit(func, clients):
+    start = time.perf_counter()
+    for client in clients:
+        func(client)
+    return (time.perf_counter() - start) / len(clients)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, nargs='+', default=[10, 30, 100, 1000])
+    parser.add_argument('--windows', type=int, default=2000)
+    args = parser.parse_args()
+
+    print("%8s %14s %14s %9s" % ("rules", "compare (us)", "index (us)", "speedup"))
+    for count in args.rules:
+        rules = make_rules(count)
+        index = RuleIndex(rules)
+        # Half the windows hit the last rule, half match nothing
+        clients = [FakeClient('App%d' % (count - 3) if i % 2 else 'unknown', 'w%d' % i)
+                   for i in range(args.windows)]
+        for client in clients + EDGE_CLIENTS:
+            assert linear(rules, client) == index.lookup(client), vars(client)
+        slow = timeit(lambda c: linear(rules, c), clients)
+        fast = timeit(index.lookup, clients)
+        print("%8d %14.2f %14.2f %8.1fx" % (count, slow * 1e6, fast * 1e6, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# Benchmark for config/qtile/screenshot.py under Xvfb: capture latency
+# through MIT-SHM and through a plain GetImage, and PNG encoding time, at
+# 1080p and at a dual-head (two 1080p outputs side by side) root size.
+#
+#   python3 bench/screenshot.py [--captures 50] [--resolutions 1920x1080 3840x1080]
+#
+# Needs Xvfb and xcffib.
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'config', 'qtile'))
+
+import xcffib  # noqa: E402
+
+from headless import free_display, wait_for  # noqa: E402
+from screenshot import Grabber, encode_png  # noqa: E402
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return "mean %7.2f ms  p95 %7.2f ms" % (
+        sum(samples) / len(samples) * 1000,
+        samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000)
+
+
+def timed(func, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def bench(resolution, captures):
+    display = free_display()
+    xvfb = subprocess.Popen(['Xvfb', display, '-nolisten', 'tcp', '+extension', 'MIT-SHM',
+                             '-screen', '0', resolution + 'x24'], stderr=subprocess.DEVNULL)
+    try:
+        wait_for(lambda: os.path.exists('/tmp/.X11-unix/X' + display[1:]), what="Xvfb")
+        conn = xcffib.connect(display=display)
+        # something other than a flat colour to encode
+        subprocess.run(['xsetroot', '-display', display, '-mod', '8', '8'],
+                       stderr=subprocess.DEVNULL, check=False)
+
+        def capture():
+            data, width, height, release = grabber.grab()
+            release()
+            return data, width, height
+
+        grabber = Grabber(conn)
+        print(resolution)
+        if grabber.shm is not None:
+            samples, _ = timed(capture, captures)
+            print("  capture, MIT-SHM     " + summary(samples))
+        else:
+            print("  capture, MIT-SHM     not available")
+        grabber.close()
+        grabber.shm = None
+        samples, (data, width, height) = timed(capture, captures)
+        print("  capture, GetImage    " + summary(samples))
+        samples, png = timed(lambda: encode_png(data, width, height), max(captures // 10, 3))
+        print("  PNG encode (worker)  " + summary(samples) + "  %d KiB" % (len(png) // 1024))
+        conn.disconnect()
+    finally:
+        xvfb.terminate()
+        xvfb.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--captures', type=int, default=50)
+    parser.add_argument('--resolutions', nargs='+', default=['1920x1080', '3840x1080'])
+    args = parser.parse_args()
+    for resolution in args.resolutions:
+        bench(resolution, args.captures)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+# A bare X client for the headless benchmark: maps one window with the given
+# WM_CLASS and stays until it is killed.
+#
+#   python3 bench/xclient.py <wm_class> [title]
+
+import sys
+
+import xcffib
+import xcffib.xproto
+
+
+def main():
+    wm_class = sys.argv[1]
+    title = sys.argv[2] if len(sys.argv) > 2 else wm_class
+
+    conn = xcffib.connect()
+    screen = conn.get_setup().roots[conn.pref_screen]
+    wid = conn.generate_id()
+    conn.core.CreateWindow(
+        screen.root_depth, wid, screen.root, 0, 0, 640, 480, 0,
+        xcffib.xproto.WindowClass.InputOutput, screen.root_visual,
+        xcffib.xproto.CW.BackPixel, [screen.white_pixel])
+
+    def set_string(atom, value):
+        conn.core.ChangeProperty(
+            xcffib.xproto.PropMode.Replace, wid, atom,
+            xcffib.xproto.Atom.STRING, 8, len(value), value)
+
+    set_string(xcffib.xproto.Atom.WM_CLASS, ('%s\0%s\0' % (wm_class, wm_class)).encode())
+    set_string(xcffib.xproto.Atom.WM_NAME, title.encode())
+    conn.core.MapWindow(wid)
+    conn.flush()
+
+    while True:
+        conn.wait_for_event()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (KeyboardInterrupt, xcffib.ConnectionException):
+        pass
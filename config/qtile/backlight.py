@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+
+import notify
+from source import Source
+
+try:
+    from dbus_next import BusType, Message, MessageType
+    from dbus_next.aio import MessageBus
+except ImportError:
+    MessageBus = None
+
+logger = logging.getLogger(__name__)
+
+BACKLIGHT = '/sys/class/backlight'
+DUNST_ICONS = os.path.expanduser('~/.local/share/icons/Dunst-Icons/')
+
+# (lowest percent, bar glyph, notification icon)
+LEVELS = [
+    (67, " ", "brightness-high.svg"),
+    (34, " ", "brightness-medium.svg"),
+    (0,  " ", "brightness-low.svg"),
+]
+
+# logind errors that won't go away by asking again; anything else is
+# retried on the next step
+LOGIND_FATAL = {
+    'org.freedesktop.DBus.Error.UnknownMethod',
+    'org.freedesktop.DBus.Error.AccessDenied',
+    'org.freedesktop.DBus.Error.ServiceUnknown',
+}
+
+
+def level(percent):
+    return next(entry for entry in LEVELS if percent >= entry[0])
+
+
+def _read_int(path):
+    with open(path) as f:
+        return int(f.read().strip())
+
+
+# Backlight read from /sys/class/backlight/<device> and written through
+# logind's Session.SetBrightness, or straight to sysfs when logind can't be
+# reached. Steps can be smoothed over a few frames; the bar is updated with
+# the new value directly instead of re-reading it.
+
+class Backlight(Source):
+
+    def __init__(self, root=BACKLIGHT, device=None, step=5, smooth=0,
+                 smooth_interval=0.015, logind=True):
+        Source.__init__(self)
+        self.root = root
+        self.device = device or self._find_device()
+        self.step = step
+        self.smooth = smooth
+        self.smooth_interval = smooth_interval
+        self.logind = logind
+        self.current = None
+        self._target = None
+        self._max = None
+        self._bus = None
+        self._bus_lock = asyncio.Lock()
+        self._steps = []
+
+    def _find_device(self):
+        try:
+            devices = sorted(os.listdir(self.root))
+        except OSError:
+            return None
+        # Prefer the panel's own driver over vendor/acpi interfaces
+        for prefix in ('intel_', 'amdgpu_', ''):
+            for device in devices:
+                if device.startswith(prefix):
+                    return device
+        return None
+
+    @property
+    def path(self):
+        return os.path.join(self.root, self.device)
+
+    @property
+    def max_brightness(self):
+        if self._max is None:
+            self._max = _read_int(os.path.join(self.path, 'max_brightness'))
+        return self._max
+
+    def percent(self, raw=None):
+        if raw is None:
+            raw = self.current
+        return round(raw * 100 / self.max_brightness)
+
+    def refresh(self):
+        if self.device is None:
+            return
+        try:
+            self.current = _read_int(os.path.join(self.path, 'actual_brightness'))
+        except OSError:
+            return
+        self.publish(self.status())
+
+    def status(self):
+        percent = self.percent()
+        return level(percent)[1] + str(percent) + "%"
+
+    # Change brightness by delta percent (step when not given)
+
+    def change(self, delta=None):
+        if self.device is None:
+            return
+        if delta is None:
+            delta = self.step
+        if self.current is None:
+            self.refresh()
+            if self.current is None:
+                return
+        # A press during a smooth step adds to where that step was going
+        base = self._target if self._steps else self.current
+        for handle in self._steps:
+            handle.cancel()
+        self._steps = []
+
+        start = self.current
+        target = base + round(delta * self.max_brightness / 100)
+        # never all the way down, a blank panel looks like a hang
+        target = min(max(target, 1), self.max_brightness)
+        self._target = target
+        if self.smooth and target != start:
+            loop = asyncio.get_event_loop()
+            for i in range(1, self.smooth):
+                value = start + (target - start) * i // self.smooth
+                self._steps.append(
+                    loop.call_later(i * self.smooth_interval, self._write, value))
+            self._steps.append(loop.call_later(
+                self.smooth * self.smooth_interval, self._finish, target))
+        else:
+            self._finish(target)
+
+    def up(self):
+        self.change(self.step)
+
+    def down(self):
+        self.change(-self.step)
+
+    def _finish(self, value):
+        self._steps = []
+        self._write(value)
+        self.notify()
+
+    def _write(self, value):
+        self.current = value
+        self.publish(self.status())
+        if self.logind and self._set_logind(value):
+            return
+        self._write_sysfs(value)
+
+    def _write_sysfs(self, value):
+        try:
+            with open(os.path.join(self.path, 'brightness'), 'w') as f:
+                f.write(str(value))
+        except OSError as e:
+            logger.warning("can't set brightness: %s", e)
+
+    def _set_logind(self, value):
+        if MessageBus is None:
+            return False
+        message = Message(
+            destination='org.freedesktop.login1',
+            path='/org/freedesktop/login1/session/auto',
+            interface='org.freedesktop.login1.Session',
+            member='SetBrightness',
+            signature='ssu',
+            body=['backlight', self.device, value])
+        asyncio.get_event_loop().create_task(self._send(message))
+        return True
+
+    # The reply is awaited so that logind refusing (no session, not allowed)
+    # falls back to sysfs instead of the keys silently doing nothing. Only
+    # errors in LOGIND_FATAL stop logind from being asked again.
+
+    async def _send(self, message):
+        try:
+            # Calls keep their order; only the first one connects
+            async with self._bus_lock:
+                if self._bus is None:
+                    self._bus = await MessageBus(bus_type=BusType.SYSTEM).connect()
+                reply = await self._bus.call(message)
+        except Exception as e:
+            self._bus = None
+            error = e
+        else:
+            if reply.message_type != MessageType.ERROR:
+                return
+            error = "%s %s" % (reply.error_name, reply.body[0] if reply.body else '')
+            if reply.error_name in LOGIND_FATAL:
+                self.logind = False
+        logger.warning("logind SetBrightness failed, writing sysfs: %s", error)
+        self._fallback()
+
+    # The failed call's value may be behind presses made since; the panel is
+    # still where sysfs says, so go from there to the latest target
+
+    def _fallback(self):
+        try:
+            actual = _read_int(os.path.join(self.path, 'actual_brightness'))
+        except OSError:
+            actual = None
+        value = self._target if self._target is not None else actual
+        if value is None:
+            return
+        if value != actual:
+            self._write_sysfs(value)
+        if value != self.current:
+            self.current = value
+            self.publish(self.status())
+
+    def notify(self):
+        percent = self.percent()
+        icon = DUNST_ICONS + level(percent)[2]
+        notify.send("Brightness: %d%%" % percent, app_name="changebrightness", icon=icon,
+                    replaces_id=5555, urgency='low', timeout=2000, value=percent)
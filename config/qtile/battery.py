@@ -0,0 +1,191 @@
+import logging
+import os
+import socket
+import time
+
+import notify
+from source import Source
+from telemetry import Telemetry
+from timer import wheel
+
+POWER_SUPPLY = '/sys/class/power_supply'
+NETLINK_KOBJECT_UEVENT = 15
+
+logger = logging.getLogger(__name__)
+
+# Capacity is only re-read on a power_supply uevent, plus a slow poll for
+# batteries whose firmware does not report every percent change.
+FALLBACK_INTERVAL = 60
+
+# Glyphs indexed by percent // 10, the last one is for a full battery
+CHARGING_ICONS = [
+    "", "", "", "", "", "",
+    "", "", "", "", "",
+]
+DISCHARGING_ICONS = [
+    "", "", "", "", "", "",
+    "", "", "", "", "",
+]
+
+
+def secs2hours(secs):
+    mm, ss = divmod(secs, 60)
+    hh, mm = divmod(mm, 60)
+    return "%d:%02d:%02d" % (hh, mm, ss)
+
+
+def secs2minutes(secs):
+    hh, mm = divmod(secs // 60, 60)
+    return "%d:%02d" % (hh, mm)
+
+
+def icon(percent, plugged):
+    icons = CHARGING_ICONS if plugged else DISCHARGING_ICONS
+    return icons[min(max(percent, 0), 100) // 10]
+
+
+def _read(path, name):
+    try:
+        with open(os.path.join(path, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _read_int(path, name):
+    value = _read(path, name)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Read the state of the first battery under root, in the same terms as
+# psutil.sensors_battery(): percent, seconds left (None if unknown) and
+# whether the charger is plugged in
+
+def read_battery(root=POWER_SUPPLY):
+    try:
+        supplies = sorted(os.listdir(root))
+    except OSError:
+        return None
+
+    battery = None
+    plugged = None
+    for name in supplies:
+        path = os.path.join(root, name)
+        kind = _read(path, 'type')
+        if kind == 'Battery' and battery is None:
+            battery = path
+        elif kind == 'Mains' and _read_int(path, 'online') is not None:
+            plugged = bool(plugged) or _read_int(path, 'online') == 1
+    if battery is None:
+        return None
+
+    now = _read_int(battery, 'energy_now') or _read_int(battery, 'charge_now')
+    full = _read_int(battery, 'energy_full') or _read_int(battery, 'charge_full')
+    rate = _read_int(battery, 'power_now') or _read_int(battery, 'current_now')
+
+    percent = _read_int(battery, 'capacity')
+    if percent is None and now is not None and full:
+        percent = int(now * 100 / full)
+    if percent is None:
+        return None
+
+    status = _read(battery, 'status')
+    if plugged is None:
+        plugged = status in ('Charging', 'Full', 'Not charging')
+
+    secsleft = None
+    if not plugged and now and rate:
+        secsleft = int(now * 3600 / rate)
+
+    return {'percent': min(percent, 100), 'secsleft': secsleft,
+            'plugged': plugged, 'energy': now, 'power': rate}
+
+
+class BatteryProvider(Source):
+
+    def __init__(self, root=POWER_SUPPLY, fallback_interval=FALLBACK_INTERVAL):
+        Source.__init__(self)
+        self.root = root
+        self.fallback_interval = fallback_interval
+        self.state = None
+        self.telemetry = None
+        self._sock = None
+
+    def start(self):
+        try:
+            self._sock = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            self._sock.bind((0, 1))
+            self._sock.setblocking(False)
+            self.loop.add_reader(self._sock.fileno(), self._on_uevent)
+        except (AttributeError, OSError):
+            self._sock = None
+        self.refresh()
+        if self.fallback_interval:
+            wheel.add(self.fallback_interval, self.refresh)
+
+    def stop(self):
+        if self._sock is not None:
+            self.loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+        wheel.remove(self.refresh)
+        if self.telemetry:
+            self.telemetry.close()
+        self.telemetry = None
+
+    def _on_uevent(self):
+        changed = False
+        while True:
+            try:
+                data = self._sock.recv(8192)
+            except BlockingIOError:
+                break
+            except OSError:
+                break
+            if b'SUBSYSTEM=power_supply' in data:
+                changed = True
+        if changed:
+            self.refresh()
+
+    # Each reading goes into the telemetry ring, and the time left comes from
+    # its averaged discharge rate rather than the jumpy instantaneous one
+
+    def refresh(self):
+        self.state = read_battery(self.root)
+        if self.state is not None and self.telemetry is None:
+            try:
+                self.telemetry = Telemetry()
+            except (OSError, ValueError) as e:
+                logger.warning("no battery telemetry: %s", e)
+                self.telemetry = False
+        if self.state is not None and self.telemetry:
+            state = self.state
+            self.telemetry.add(time.time(), state['energy'], state['power'], not state['plugged'])
+            if not state['plugged']:
+                state['secsleft'] = self.telemetry.estimate(state['energy']) or state['secsleft']
+        self.publish(self.status())
+
+    def status(self):
+        if self.state is None:
+            return ""
+        percent = self.state['percent']
+        text = icon(percent, self.state['plugged']) + " " + str(percent) + "%"
+        if not self.state['plugged'] and self.state['secsleft'] is not None:
+            text += " " + secs2minutes(self.state['secsleft'])
+        return text
+
+    def left_click(self):
+        self.refresh()
+        if self.state is None:
+            return
+        if not self.state['plugged']:
+            secsleft = self.state['secsleft']
+            remaining = secs2hours(secsleft) if secsleft is not None else "unknown"
+            message = "Remaining time left: " + remaining
+        else:
+            message = str(self.state['percent']) + "% Charged"
+        notify.send(message, replaces_id=55555, urgency='normal')
@@ -1,15 +1,36 @@
-from sqlite3 import Cursor
-from typing import List
+import startup  # first, so the startup timeline starts here
 from libqtile import qtile
-from libqtile import bar, layout, widget
+from libqtile import layout, widget
 from libqtile.config import Click, Drag, Group, Key, Match, Screen
-from libqtile.layout.floating import Floating
 from libqtile.lazy import lazy
 from libqtile import hook
 from datetime import datetime as dt
 import os
 import subprocess
-import time
+
+import damage
+import instrument
+import notify
+import rules
+from backlight import Backlight
+from battery import BatteryProvider
+from history import GroupHistory
+from hotplug import Hotplug
+from keyrepeat import keyqueue
+from monitors import get_monitors
+from network import NetworkProvider
+from placement import PlacementScheduler
+from rules import IndexedFloating, RuleIndex
+from screenshot import Screenshots
+from snapshot import Snapshot
+from source import FuncSource
+from timer import wheel
+from updates import PacmanUpdates
+from volume import Volume
+from widgets import LazyWidgetBox, SourceText
+from wifi import WifiScanner
+
+startup.mark('imports')
 
 mod = 'mod4'
 alt = 'mod1'
@@ -20,54 +41,76 @@ rofi = os.path.expanduser('~/.config/rofi/')
 scripts = os.path.expanduser('~/.local/bin/scripts/')
 
 
-# Get the number of connected screens
-
-def get_monitors():
-    xr = subprocess.check_output(
-        'xrandr --query | grep " connected"', shell=True).decode().split('\n')
-    monitors = len(xr) - 1 if len(xr) > 2 else len(xr)
-    return monitors
-
+# Get the connected screens
 
 monitors = get_monitors()
+startup.mark('monitor detection')
 
 
 @hook.subscribe.screen_change
 def set_screens(event):
-    subprocess.run("screenlayout.sh")
-    qtile.restart()
+    hotplug.screen_change(qtile)
 
 
 # When application launched automatically focus it's group
 
+placement = PlacementScheduler(lambda client: group_rules.lookup(client))
+
+
 @hook.subscribe.client_new
 def modify_window(client):
-    for group in groups:  # follow on auto-move
-        match = next((m for m in group.matches if m.compare(client)), None)
-        if match:
-            # there can be multiple instances of a group
-            targetgroup = client.qtile.groups_map[group.name]
-            targetgroup.cmd_toscreen(toggle=False)
-            break
+    if snapshot.restore_window(client):
+        return  # already on its group before the restart
+    placement.client_new(client)  # follow on auto-move
+
+
+@hook.subscribe.client_focus
+def record_focus(client):
+    placement.client_focus(client)
+
+
+# Recently used groups, to fall back to when the last window of a group is killed
 
+history = GroupHistory()
+
+
+@hook.subscribe.setgroup
+def record_group():
+    history.setgroup(qtile)
+
+
+@hook.subscribe.client_managed
+def count_window(client):
+    history.client_managed(client)
+
+
+@hook.subscribe.group_window_add
+def move_window(group, window):
+    history.group_window_add(group, window)
 
-# Hook to fallback to the first group with windows when last window of group is killed
 
 @hook.subscribe.client_killed
 def fallback(window):
-    if window.group.windows != [window]:
+    placement.client_killed(window)
+    history.client_killed(window)
+    if window.group is not qtile.current_group or window.group.windows != [window]:
         return
-    idx = qtile.groups.index(window.group)
-    for group in qtile.groups[idx - 1::-1]:
-        if group.windows:
-            qtile.current_screen.toggle_group(group)
-            return
-    qtile.current_screen.toggle_group(qtile.groups[0])
+    group = qtile.groups_map.get(history.most_recent(), qtile.groups[0])
+    qtile.current_screen.toggle_group(group)
 
 
-@hook.subscribe.client_new
-def slight_delay(window):
-    time.sleep(0.04)
+@hook.subscribe.shutdown
+def save_snapshot():
+    snapshot.save(qtile)
+
+
+@hook.subscribe.startup_complete
+def startup_timeline():
+    snapshot.restore_focus(qtile)
+    wifi.start()
+    # Only now, so the network source starts from the restored snapshot
+    network.subscribe(wifi.link_changed)
+    startup.finish()
 
 
 @hook.subscribe.startup_once
@@ -127,6 +170,9 @@ COLOR_5 = "#1e1e2e"
 COLOR_6 = "#45475a"
 COLOR_7 = "#11111b"
 
+# Captured in-process, encoded to PNG in a worker thread
+screenshots = Screenshots()
+
 keys = [
 
     # ------------  Window Management ------------
@@ -190,23 +236,23 @@ keys = [
         desc="Launch browser"),
 
     # ------------  Hardware Configs  ------------
-    Key([], "XF86AudioMute",            lazy.spawn(scripts + "changevolume mute"),
+    Key([], "XF86AudioMute",            lazy.function(lambda qtile: keyqueue.push(volume.toggle_mute)),
         desc='Mute audio'),
-    Key([], "XF86AudioLowerVolume",     lazy.spawn(scripts + "changevolume down"),
+    Key([], "XF86AudioLowerVolume",     lazy.function(lambda qtile: keyqueue.push(volume.change, -volume.step)),
         desc='Volume down'),
-    Key([], "XF86AudioRaiseVolume",     lazy.spawn(scripts + "changevolume up"),
+    Key([], "XF86AudioRaiseVolume",     lazy.function(lambda qtile: keyqueue.push(volume.change, volume.step)),
         desc='Volume up'),
 
-    Key([], "XF86MonBrightnessDown",    lazy.spawn(scripts + "changebrightness down"),
+    Key([], "XF86MonBrightnessDown",    lazy.function(lambda qtile: keyqueue.push(brightness.change, -brightness.step)),
         desc='Brightness down'),
-    Key([], "XF86MonBrightnessUp",      lazy.spawn(scripts + "changebrightness up"),
+    Key([], "XF86MonBrightnessUp",      lazy.function(lambda qtile: keyqueue.push(brightness.change, brightness.step)),
         desc='Brightness up'),
 
-    Key([],                 "Print",    lazy.spawn(scripts + "screenshot"),
+    Key([],                 "Print",    lazy.function(screenshots.full),
         desc='Take screen'),
-    Key([mod],              "Print",    lazy.spawn(scripts + "screenshot window"),
+    Key([mod],              "Print",    lazy.function(screenshots.window),
         desc='Take screen of Window'),
-    Key([mod, "shift"],     "s",        lazy.spawn(scripts + "screenshot select"),
+    Key([mod, "shift"],     "s",        lazy.function(screenshots.select),
         desc='Take screen of Region'),
 ]
 
@@ -244,10 +290,18 @@ for workspace in workspaces:
     keys.append(Key([mod, "shift"], workspace["key"],
                     lazy.window.togroup(workspace["name"])))
 
+# The compiled tables depend on the rules here and on how rules.py builds
+# them, and are pickled by startup.py
+RULE_SOURCES = (__file__, rules.__file__, startup.__file__)
+
+group_matches = [(group.name, m) for group in groups for m in group.matches]
+group_rules = RuleIndex(group_matches, startup.cached(
+    'group_rules', lambda: RuleIndex.compile(group_matches), *RULE_SOURCES))
+
 # Move window to screen with Mod, Alt and number
 
 
-for i in range(monitors):
+for i in range(len(monitors)):
     keys.extend([Key([mod, "mod1"], str(i), lazy.window.toscreen(i))])
 
 # DEFAULT THEME SETTINGS FOR LAYOUTS #
@@ -286,242 +340,276 @@ group_defaults = dict(
 
 screens = []
 
+# Data sources shared by every bar: each value is computed once, however
+# many bars show it
+
+def count_updates(count):
+    return ' {updates}'.format(updates=count) if count else ''
+
+
+battery = BatteryProvider()
+network = NetworkProvider()
+brightness = Backlight()
+volume = Volume()
+date = FuncSource(custom_date, period=60)  # the format has no seconds
+updates = PacmanUpdates(format=count_updates)
+# Keeps the rofi wifi menu's list fresh in the background
+wifi = WifiScanner()
+
+
+def wifi_menu():
+    wifi.menu_opened()
+    qtile.cmd_spawn(rofi + 'wifi-menu.sh', shell=True)
+
+
+sources = {'battery': battery, 'network': network, 'brightness': brightness,
+           'volume': volume, 'date': date, 'updates': updates}
+
+# Values from before a restart, so the bars paint complete straight away
+snapshot = Snapshot(sources, history)
+snapshot.restore()
+
 # ZeroNet.svg
 menu_svg = '/usr/share/icons/Papirus-Dark/16x16/apps/'
 menu_svg += 'void-wizard.svg'
 
-widget_mirror = [
-    widget.CheckUpdates(
-        **widget_defaults,
-        background=COLOR_3,
-        foreground=COLOR_5,
-        colour_have_updates=COLOR_5,
-        update_interval=1800,
-        custom_command='paru -Qu',
-        display_format=' {updates}',
-        execute=terminal + ' -e paru',
-        distro='Arch',
-    ),
-    widget.GenPollText(
-        **widget_defaults,
-        background=COLOR_3,
-        foreground=COLOR_5,
-        update_interval=None,
-        func=lambda: subprocess.check_output(
-            scripts + "changebrightness").decode(),
-        mouse_callbacks={
-            'Button1': lambda: qtile.cmd_spawn("gddccontrol", shell=True),
-            'Button5': lambda: qtile.cmd_spawn(scripts + "changebrightness down", shell=True),
-            'Button4': lambda: qtile.cmd_spawn(scripts + "changebrightness up", shell=True)}
-    ),
-    widget.GenPollText(
-        **widget_defaults,
-        background=COLOR_3,
-        foreground=COLOR_5,
-        update_interval=None,
-        func=lambda: subprocess.check_output(
-            scripts + "changevolume").decode(),
-        mouse_callbacks={
-            'Button1': lambda: qtile.cmd_spawn("pavucontrol", shell=True),
-            'Button5': lambda: qtile.cmd_spawn(scripts + "changevolume down", shell=True),
-            'Button2': lambda: qtile.cmd_spawn(scripts + "changevolume mute", shell=True),
-            'Button4': lambda: qtile.cmd_spawn(scripts + "changevolume up", shell=True)}
-    ),
-    widget.GenPollText(
-        **widget_defaults,
-        background=COLOR_3,
-        foreground=COLOR_5,
-        update_interval=1,
-        func=lambda: subprocess.check_output(scripts + "battery.py").decode(),
-        mouse_callbacks={
-            'Button1': lambda: qtile.cmd_spawn(scripts + "battery.py --c left-click", shell=True)}
-    ),
-    widget.TextBox(
-        **pl_defaults,
-        fmt='',
-        background=COLOR_3,
-        foreground=COLOR_2,
-    ),
-    widget.GenPollText(
-        **widget_defaults,
-        background=COLOR_2,
-        foreground=COLOR_5,
-        update_interval=1,
-        func=lambda: subprocess.check_output(scripts + "network.sh").decode(),
-        mouse_callbacks={
-            'Button1': lambda: qtile.cmd_spawn(rofi + "network-applet.sh", shell=True),
-            'Button3': lambda: qtile.cmd_spawn(rofi + 'wifi-menu.sh', shell=True)}
-    ),
-    widget.TextBox(
-        **widget_defaults,
-        background=COLOR_2,
-        foreground=COLOR_5,
-        text=' ',
-        mouse_callbacks={
-            'Button1': lazy.spawn("/home/roshi/.config/rofi/powermenu-applet.sh")}
-    ),
-    widget.Spacer(
-        length=5,
-        background=COLOR_2
-    ),
-]
 
-widgets_1 = [
-    widget.Spacer(
-        length=10,
-        background=COLOR_2
-    ),
-    widget.Image(
-        background=COLOR_2,
-        filename=menu_svg,
-        rotate=270,
-        mouse_callbacks={
-            'Button1': lazy.spawn(rofi + "launcher.sh")}
-    ),
-    widget.TextBox(
-        **pl_defaults,
-        fmt='',
-        background=COLOR_3,
-        foreground=COLOR_2
-    ),
-    widget.GroupBox(
-        **group_defaults,
-        disable_drag=True,
-        highlight_method='line',
-        borderwidth=3,
-        active=COLOR_5,
-        inactive=COLOR_6,
-        background=COLOR_3,
-        this_current_screen_border=COLOR_5,
-        this_screen_border=COLOR_5,
-        highlight_color=[COLOR_3, COLOR_3]
-    ),
-    widget.TextBox(
-        **pl_defaults,
-        fmt='',
-        background=COLOR_4,
-        foreground=COLOR_3
-    ),
-    widget.CurrentLayoutIcon(
-        scale=0.80,
-        background=COLOR_4,
-    ),
-    widget.CurrentLayout(
-        **widget_defaults,
-        background=COLOR_4,
-    ),
-    widget.TextBox(
-        **pl_defaults,
-        fmt='',
-        background=COLOR_7,
-        foreground=COLOR_4
-    ),
-    widget.Spacer(),
-    widget.GenPollText(
-        font='JetBrainsMono Medium Nerd Font',
-        fontsize='16',
-        padding=3,
-        func=custom_date,
-        update_interval=1,
-    ),
-    widget.Spacer(),
-    widget.WidgetBox(
-        **pl_defaults,
-        widgets=[
-            widget.Spacer(length=5, background=COLOR_4),
-            widget.Systray(background=COLOR_4, foreground=COLOR_4)
-        ],
-        background=COLOR_7,
-        foreground=COLOR_4,
-        text_closed="",
-        text_open=""),
-    widget.Spacer(
-        length=5,
-        background=COLOR_4,
-    ),
-    widget.TextBox(
-        **pl_defaults,
-        fmt='',
-        background=COLOR_4,
-        foreground=COLOR_3,
-    ),
-] + widget_mirror
-
-widgets_2 = [
-    widget.Spacer(
-        length=10,
-        background=COLOR_2
-    ),
-    widget.Image(
-        background=COLOR_2,
-        filename=menu_svg,
-        rotate=270,
-        mouse_callbacks={
-            'Button1': lazy.spawn(rofi + "launcher.sh")}
-    ),
-    widget.TextBox(
-        **pl_defaults,
-        fmt='',
-        background=COLOR_3,
-        foreground=COLOR_2
-    ),
-    widget.GroupBox(
-        **group_defaults,
-        disable_drag=True,
-        highlight_method='line',
-        borderwidth=3,
-        active=COLOR_5,
-        inactive=COLOR_6,
-        background=COLOR_3,
-        this_current_screen_border=COLOR_5,
-        this_screen_border=COLOR_5,
-        highlight_color=[COLOR_3, COLOR_3]
-    ),
-    widget.TextBox(
-        **pl_defaults,
-        fmt='',
-        background=COLOR_4,
-        foreground=COLOR_3
-    ),
-    widget.CurrentLayoutIcon(
-        scale=0.80,
-        background=COLOR_4,
-    ),
-    widget.CurrentLayout(
-        **widget_defaults,
-        background=COLOR_4,
-    ),
-    widget.TextBox(
-        **pl_defaults,
-        fmt='',
-        background=COLOR_7,
-        foreground=COLOR_4
-    ),
-    widget.Spacer(),
-    widget.GenPollText(
-        font='JetBrainsMono Medium Nerd Font',
-        fontsize='16',
-        padding=3,
-        func=custom_date,
-        update_interval=1,
-    ),
-    widget.Spacer(),
-    widget.TextBox(
-        **pl_defaults,
-        fmt='',
-        background=COLOR_7,
-        foreground=COLOR_3,
-    ),
-] + widget_mirror
-
-
-for monitor in range(monitors):
+# A widget can only sit on one bar, so every screen gets its own instances.
+# They all subscribe to the sources above and never poll themselves.
+
+def widget_mirror():
+    return [
+        SourceText(
+            updates,
+            **widget_defaults,
+            background=COLOR_3,
+            foreground=COLOR_5,
+            mouse_callbacks={
+                'Button1': lambda: qtile.cmd_spawn(terminal + ' -e paru')}
+        ),
+        SourceText(
+            brightness,
+            **widget_defaults,
+            background=COLOR_3,
+            foreground=COLOR_5,
+            mouse_callbacks={
+                'Button1': lambda: qtile.cmd_spawn("gddccontrol", shell=True),
+                'Button5': brightness.down,
+                'Button4': brightness.up}
+        ),
+        SourceText(
+            volume,
+            **widget_defaults,
+            background=COLOR_3,
+            foreground=COLOR_5,
+            mouse_callbacks={
+                'Button1': lambda: qtile.cmd_spawn("pavucontrol", shell=True),
+                'Button5': volume.down,
+                'Button2': volume.toggle_mute,
+                'Button4': volume.up}
+        ),
+        SourceText(
+            battery,
+            **widget_defaults,
+            background=COLOR_3,
+            foreground=COLOR_5,
+            mouse_callbacks={
+                'Button1': battery.left_click}
+        ),
+        widget.TextBox(
+            **pl_defaults,
+            fmt='',
+            background=COLOR_3,
+            foreground=COLOR_2,
+        ),
+        SourceText(
+            network,
+            **widget_defaults,
+            background=COLOR_2,
+            foreground=COLOR_5,
+            mouse_callbacks={
+                'Button1': lambda: qtile.cmd_spawn(rofi + "network-applet.sh", shell=True),
+                'Button2': network.show_info,
+                'Button3': wifi_menu}
+        ),
+        widget.TextBox(
+            **widget_defaults,
+            background=COLOR_2,
+            foreground=COLOR_5,
+            text=' ',
+            mouse_callbacks={
+                'Button1': lazy.spawn("/home/roshi/.config/rofi/powermenu-applet.sh")}
+        ),
+        widget.Spacer(
+            length=5,
+            background=COLOR_2
+        ),
+    ]
+
+
+def widgets_1():
+    return [
+        widget.Spacer(
+            length=10,
+            background=COLOR_2
+        ),
+        widget.Image(
+            background=COLOR_2,
+            filename=menu_svg,
+            rotate=270,
+            mouse_callbacks={
+                'Button1': lazy.spawn(rofi + "launcher.sh")}
+        ),
+        widget.TextBox(
+            **pl_defaults,
+            fmt='',
+            background=COLOR_3,
+            foreground=COLOR_2
+        ),
+        widget.GroupBox(
+            **group_defaults,
+            disable_drag=True,
+            highlight_method='line',
+            borderwidth=3,
+            active=COLOR_5,
+            inactive=COLOR_6,
+            background=COLOR_3,
+            this_current_screen_border=COLOR_5,
+            this_screen_border=COLOR_5,
+            highlight_color=[COLOR_3, COLOR_3]
+        ),
+        widget.TextBox(
+            **pl_defaults,
+            fmt='',
+            background=COLOR_4,
+            foreground=COLOR_3
+        ),
+        widget.CurrentLayoutIcon(
+            scale=0.80,
+            background=COLOR_4,
+        ),
+        widget.CurrentLayout(
+            **widget_defaults,
+            background=COLOR_4,
+        ),
+        widget.TextBox(
+            **pl_defaults,
+            fmt='',
+            background=COLOR_7,
+            foreground=COLOR_4
+        ),
+        widget.Spacer(),
+        SourceText(
+            date,
+            font='JetBrainsMono Medium Nerd Font',
+            fontsize='16',
+            padding=3,
+        ),
+        widget.Spacer(),
+        LazyWidgetBox(
+            lambda: [
+                widget.Spacer(length=5, background=COLOR_4),
+                widget.Systray(background=COLOR_4, foreground=COLOR_4)
+            ],
+            **pl_defaults,
+            background=COLOR_7,
+            foreground=COLOR_4,
+            text_closed="",
+            text_open=""),
+        widget.Spacer(
+            length=5,
+            background=COLOR_4,
+        ),
+        widget.TextBox(
+            **pl_defaults,
+            fmt='',
+            background=COLOR_4,
+            foreground=COLOR_3,
+        ),
+    ] + widget_mirror()
+
+
+def widgets_2():
+    return [
+        widget.Spacer(
+            length=10,
+            background=COLOR_2
+        ),
+        widget.Image(
+            background=COLOR_2,
+            filename=menu_svg,
+            rotate=270,
+            mouse_callbacks={
+                'Button1': lazy.spawn(rofi + "launcher.sh")}
+        ),
+        widget.TextBox(
+            **pl_defaults,
+            fmt='',
+            background=COLOR_3,
+            foreground=COLOR_2
+        ),
+        widget.GroupBox(
+            **group_defaults,
+            disable_drag=True,
+            highlight_method='line',
+            borderwidth=3,
+            active=COLOR_5,
+            inactive=COLOR_6,
+            background=COLOR_3,
+            this_current_screen_border=COLOR_5,
+            this_screen_border=COLOR_5,
+            highlight_color=[COLOR_3, COLOR_3]
+        ),
+        widget.TextBox(
+            **pl_defaults,
+            fmt='',
+            background=COLOR_4,
+            foreground=COLOR_3
+        ),
+        widget.CurrentLayoutIcon(
+            scale=0.80,
+            background=COLOR_4,
+        ),
+        widget.CurrentLayout(
+            **widget_defaults,
+            background=COLOR_4,
+        ),
+        widget.TextBox(
+            **pl_defaults,
+            fmt='',
+            background=COLOR_7,
+            foreground=COLOR_4
+        ),
+        widget.Spacer(),
+        SourceText(
+            date,
+            font='JetBrainsMono Medium Nerd Font',
+            fontsize='16',
+            padding=3,
+        ),
+        widget.Spacer(),
+        widget.TextBox(
+            **pl_defaults,
+            fmt='',
+            background=COLOR_7,
+            foreground=COLOR_3,
+        ),
+    ] + widget_mirror()
+
+
+def make_screen(monitor):
     if monitor == 0:
-        screens.append(
-            Screen(top=bar.Bar(widgets_1, 30, background=COLOR_7, margin=0)))  # [4, 8, 0, 8]
-    else:
-        screens.append(
-            Screen(top=bar.Bar(widgets_2, 30, background=COLOR_7, margin=0)))
+        return Screen(top=damage.DamageBar(widgets_1(), 30, background=COLOR_7, margin=0))  # [4, 8, 0, 8]
+    return Screen(top=damage.DamageBar(widgets_2(), 30, background=COLOR_7, margin=0))
+
+
+for monitor in range(len(monitors)):
+    screens.append(make_screen(monitor))
+
+# Outputs coming and going are handled in place, see set_screens
+hotplug = Hotplug(make_screen, scripts + "screenlayout.sh")
+reconfigure_screens = False
+startup.mark('bars and widgets')
 
 
 # Drag floating layouts.
@@ -538,7 +626,7 @@ dgroups_app_rules = []
 follow_mouse_focus = True
 bring_front_click = False
 cursor_warp = False
-floating_layout = layout.Floating(float_rules=[
+float_rules = [
     # Run the utility of `xprop` to see the wm class and name of an X client.
     # *layout.Floating.default_float_rules,
     Match(title='Quit and close tabs?'),
@@ -567,12 +655,30 @@ floating_layout = layout.Floating(float_rules=[
     Match(wm_class='ssh-askpass'),  # ssh-askpass
     Match(title='branchdialog'),  # gitk
     Match(title='pinentry'),  # GPG key password entry
-],
+]
+floating_layout = IndexedFloating(
+    float_rules=float_rules,
+    compiled=startup.cached(
+        'float_rules', lambda: RuleIndex.compile([(True, m) for m in float_rules]),
+        *RULE_SOURCES),
     border_width=0
 )
 auto_fullscreen = True
 focus_on_window_activation = "smart"
 
+# Hook, poll and event loop latency, opt in with QTILE_INSTRUMENT=1
+
+if instrument.enabled:
+    instrument.install(
+        hook,
+        sources=sources,
+        stats={'placement': placement.stats, 'keys': keyqueue.stats,
+               'notifications': lambda: {'sent': notify.notifier.sent,
+                                         'dropped': notify.notifier.dropped},
+               'timer': lambda: {'wakeups': wheel.wakeups},
+               'bar': damage.stats,
+               'screenshots': screenshots.stats})
+
 # XXX: Gasp! We're lying here. In fact, nobody really uses or cares about this
 # string besides java UI toolkits; you can see several discussions on the
 # mailing lists, GitHub issues, and other WM documentation that suggest setting
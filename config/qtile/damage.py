@@ -0,0 +1,137 @@
+import time
+
+from libqtile import bar, widget
+from libqtile.widget import base
+
+
+# What a widget's pixels depend on, per widget class. Widgets of a class
+# that isn't listed are drawn every time, as before.
+
+def _text_key(w):
+    return (w.text, w.foreground, w.background, w.font, w.fontsize, w.fontshadow, w.padding)
+
+
+def _spacer_key(w):
+    return (w.background, w.length)
+
+
+def _groupbox_key(w):
+    current = w.bar.screen.group
+    return (
+        tuple((g.name, g.label, g.screen is not None and g.screen.index, bool(g.windows),
+               any(getattr(win, 'urgent', False) for win in g.windows))
+              for g in w.groups),
+        current.name if current is not None else None,
+        w.qtile.current_screen is w.bar.screen,
+    )
+
+
+KEYS = {
+    base._TextBox: _text_key,
+    widget.Spacer: _spacer_key,
+    widget.GroupBox: _groupbox_key,
+}
+
+
+def damage_key(w):
+    for cls in type(w).__mro__:
+        key = KEYS.get(cls)
+        if key is not None:
+            return key(w)
+    return None
+
+
+class Stats:
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.drawn = 0
+        self.copied = 0
+        self.skipped = 0
+        self.bytes = 0
+
+    def __call__(self):
+        minutes = max(time.monotonic() - self.started, 1) / 60
+        return {
+            'drawn': self.drawn,
+            'copied': self.copied,
+            'skipped': self.skipped,
+            'bytes_to_x': self.bytes,
+            'skipped_per_min': self.skipped / minutes,
+            'bytes_to_x_per_min': self.bytes / minutes,
+        }
+
+
+stats = Stats()
+
+
+# A bar that only repaints the widgets that changed. Each widget's draw()
+# is wrapped to compare what the widget would show now, and where, with
+# the last time it was painted:
+#   - same content, same place: skipped, the pixels on the bar still stand
+#   - same content, moved: the widget's already rendered pixmap is copied
+#     to its new place, so static text (the powerline separators) is laid
+#     out and rendered by Pango only once
+#   - anything else: drawn as usual
+# An expose event repaints everything, since the server lost the pixels, and
+# so does a reconfigure, which gives widgets new drawers, or a new bar length.
+# Bytes to X are estimated as 4 bytes per pixel copied to the bar window.
+
+class DamageBar(bar.Bar):
+
+    def __init__(self, widgets, size, **config):
+        bar.Bar.__init__(self, widgets, size, **config)
+        self._painted = {}
+        self._painted_length = None
+        self._invalid = True
+
+    def _wrap(self, w):
+        draw = w.draw
+
+        def damage_draw():
+            key = damage_key(w)
+            placed = (w.offsetx, w.offsety, w.width, w.height)
+            last = self._painted.get(w)
+            if key is None or self._invalid or last is None or last[1] != key:
+                draw()
+                stats.drawn += 1
+            elif last[0] != placed:
+                w.drawer.draw(offsetx=w.offsetx, offsety=w.offsety, width=w.width, height=w.height)
+                stats.copied += 1
+            else:
+                stats.skipped += 1
+                return
+            stats.bytes += w.width * w.height * 4
+            self._painted[w] = (placed, key)
+
+        damage_draw.damage_wrapped = True
+        w.draw = damage_draw
+
+    def _actual_draw(self):
+        for w in self.widgets:
+            if not getattr(w.draw, 'damage_wrapped', False):
+                self._wrap(w)
+        bar.Bar._actual_draw(self)
+        self._invalid = False
+
+    def _invalidate(self):
+        self._painted.clear()
+        self._invalid = True
+
+    def _configure(self, *args, **kwargs):
+        self._invalidate()
+        bar.Bar._configure(self, *args, **kwargs)
+
+    # Bar._actual_draw lays the widgets out again on every draw. Only a new
+    # bar length repaints everything; a widget that moved or changed size
+    # no longer matches where it was painted and is copied or drawn.
+
+    def _resize(self, length, widgets):
+        if length != self._painted_length:
+            self._invalidate()
+            self._painted_length = length
+        bar.Bar._resize(self, length, widgets)
+
+    def process_window_expose(self):
+        self._invalid = True
+        bar.Bar.process_window_expose(self)
@@ -0,0 +1,84 @@
+from collections import Counter, OrderedDict
+
+
+# Most-recently-used order of groups plus a window count per group, kept up
+# to date from hooks. The groups that have windows are kept in their own
+# MRU-ordered dict, so finding the group to fall back to when one empties is
+# a single lookup at its end. Only the order is kept across restarts (by
+# snapshot.py): window counts are rebuilt as qtile manages the existing
+# windows again.
+
+class GroupHistory:
+
+    def __init__(self):
+        self.counts = Counter()
+        self.stamps = {}
+        self.occupied = OrderedDict()
+        self._groups = {}
+        self._clock = 0
+
+    def _touch(self, name):
+        self._clock += 1
+        self.stamps[name] = self._clock
+        if name in self.occupied:
+            self.occupied.move_to_end(name)
+
+    def _add(self, name):
+        self.counts[name] += 1
+        if self.counts[name] > 1 or name in self.occupied:
+            return
+        self.occupied[name] = None
+        if name not in self.stamps:
+            # never visited: ranks below every visited group
+            self.occupied.move_to_end(name, last=False)
+        else:
+            # rare (a window placed on a group we're not on), so a sort is fine
+            order = sorted(self.occupied, key=lambda group: self.stamps.get(group, 0))
+            self.occupied = OrderedDict.fromkeys(order)
+
+    def _remove(self, name):
+        self.counts[name] -= 1
+        if self.counts[name] <= 0:
+            del self.counts[name]
+            self.occupied.pop(name, None)
+
+    def setgroup(self, qtile):
+        name = qtile.current_group.name
+        self._touch(name)
+        if self.counts[name] > 0:
+            self.occupied[name] = None
+            self.occupied.move_to_end(name)
+
+    def client_managed(self, client):
+        if client.group is not None:
+            self._groups[client.wid] = client.group.name
+            self._add(client.group.name)
+
+    # Windows moved to another group; new windows are counted by
+    # client_managed, which fires after this
+
+    def group_window_add(self, group, window):
+        old = self._groups.get(window.wid)
+        if old is not None and old != group.name:
+            self._groups[window.wid] = group.name
+            self._remove(old)
+            self._add(group.name)
+
+    def client_killed(self, client):
+        name = self._groups.pop(client.wid, None)
+        if name is not None:
+            self._remove(name)
+
+    # The most recently used group that still has windows
+
+    def most_recent(self):
+        if not self.occupied:
+            return None
+        return next(reversed(self.occupied))
+
+    def snapshot(self):
+        return sorted(self.stamps, key=self.stamps.__getitem__)
+
+    def restore(self, order):
+        for name in order:
+            self._touch(name)
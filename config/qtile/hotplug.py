@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import shlex
+import time
+
+import poll
+from monitors import get_monitors
+
+logger = logging.getLogger(__name__)
+
+DPI = 96
+
+
+# Read the xrandr invocation in screenlayout.sh into
+# {output: {'off': bool, 'primary': bool, 'mode': 'WxH', 'pos': (x, y)}}
+
+def parse_screenlayout(path):
+    with open(path) as f:
+        text = f.read().replace('\\\n', ' ')
+    layout = {}
+    for line in text.splitlines():
+        args = shlex.split(line, comments=True)
+        if not args or not args[0].endswith('xrandr'):
+            continue
+        output = None
+        args = iter(args[1:])
+        for arg in args:
+            if arg == '--output':
+                output = layout.setdefault(next(args), {'off': False, 'primary': False})
+            elif output is None:
+                continue
+            elif arg == '--off':
+                output['off'] = True
+            elif arg == '--primary':
+                output['primary'] = True
+            elif arg == '--mode':
+                output['mode'] = next(args)
+            elif arg == '--pos':
+                x, y = next(args).split('x')
+                output['pos'] = (int(x), int(y))
+            elif arg == '--rotate':
+                if next(args) != 'normal':
+                    raise ValueError("only --rotate normal is supported")
+    return layout
+
+
+# Apply a parsed layout through RandR on an existing xcffib connection, the
+# same steps xrandr takes: turn the affected CRTCs off, resize the root
+# window, then light up each output on a free CRTC.
+
+def apply_layout(conn, layout):
+    import xcffib.randr
+
+    randr = conn(xcffib.randr.key)
+    root = conn.get_setup().roots[conn.pref_screen].root
+    resources = randr.GetScreenResourcesCurrent(root).reply()
+    timestamp = resources.config_timestamp
+
+    names = bytes(resources.names)
+    modes = {}
+    offset = 0
+    for mode in resources.modes:
+        name = names[offset:offset + mode.name_len].decode()
+        offset += mode.name_len
+        modes.setdefault(name, mode.id)
+
+    outputs = {}
+    for output in resources.outputs:
+        info = randr.GetOutputInfo(output, timestamp).reply()
+        outputs[bytes(info.name).decode()] = (output, info)
+
+    # CRTCs driving outputs the layout does not mention stay as they are
+    used = {info.crtc for name, (_, info) in outputs.items()
+            if name not in layout and info.crtc}
+    wanted = []
+    for name, config in layout.items():
+        if name not in outputs:
+            continue
+        output, info = outputs[name]
+        if info.crtc:
+            randr.SetCrtcConfig(info.crtc, 0, timestamp, 0, 0, 0,
+                                xcffib.randr.Rotation.Rotate_0, 0, []).reply()
+        if not config['off'] and info.connection == xcffib.randr.Connection.Connected \
+                and config.get('mode') in modes:
+            wanted.append((output, info, config))
+
+    if not wanted:
+        return
+    width = height = 0
+    for _, _, config in wanted:
+        x, y = config.get('pos', (0, 0))
+        w, h = config['mode'].split('x')
+        width = max(width, x + int(w))
+        height = max(height, y + int(h))
+    randr.SetScreenSize(root, width, height,
+                        int(width * 25.4 / DPI), int(height * 25.4 / DPI))
+
+    for output, info, config in wanted:
+        crtc = next(c for c in info.crtcs if c not in used)
+        used.add(crtc)
+        x, y = config.get('pos', (0, 0))
+        randr.SetCrtcConfig(crtc, 0, timestamp, x, y, modes[config['mode']],
+                            xcffib.randr.Rotation.Rotate_0, 1, [output]).reply()
+        if config['primary']:
+            randr.SetOutputPrimary(root, output)
+    conn.flush()
+
+
+# Handles screen_change without restarting qtile: when the set of connected
+# outputs changes, the layout from screenlayout.sh is applied in-process and
+# only the Screen objects for added or removed outputs are created or
+# dropped. Everything already on screen keeps its bars, widgets and windows.
+# Screens for removed outputs are left for qtile to finalize their bars, so
+# an output that comes back gets a new Screen from make_screen.
+
+class Hotplug:
+
+    def __init__(self, make_screen, screenlayout):
+        self.make_screen = make_screen
+        self.screenlayout = screenlayout
+        self.outputs = {m.name for m in get_monitors()}
+
+    def screen_change(self, qtile):
+        start = time.perf_counter()
+        monitors = get_monitors(refresh=True)
+        outputs = {m.name for m in monitors}
+        if outputs != self.outputs:
+            self.outputs = outputs
+            self.apply_layout(qtile)
+            # Applying the layout raises one more screen_change, which finds
+            # the same outputs and only has to resize
+            monitors = get_monitors(refresh=True)
+
+        screens = qtile.config.screens
+        count = max(len([m for m in monitors if m.width]), 1)
+        while len(screens) < count:
+            screens.append(self.make_screen(len(screens)))
+
+        # Kills the bars of the screens past count
+        qtile.cmd_reconfigure_screens()
+        del screens[count:]
+
+        logger.info("screens reconfigured in %.1f ms",
+                    (time.perf_counter() - start) * 1000)
+
+    def apply_layout(self, qtile):
+        try:
+            apply_layout(qtile.core.conn.conn, parse_screenlayout(self.screenlayout))
+        except Exception:
+            logger.exception("applying %s in-process failed, running it", self.screenlayout)
+            asyncio.get_event_loop().create_task(self._run_screenlayout())
+
+    async def _run_screenlayout(self):
+        try:
+            await poll.run([self.screenlayout], timeout=10)
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning("%s failed: %r", self.screenlayout, e)
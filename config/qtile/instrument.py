@@ -0,0 +1,160 @@
+import asyncio
+import functools
+import json
+import os
+import time
+from collections import deque
+
+import poll
+from timer import wheel
+
+# Opt in by starting qtile with QTILE_INSTRUMENT=1
+enabled = bool(os.environ.get('QTILE_INSTRUMENT'))
+
+STALL_THRESHOLD = 0.05
+HEARTBEAT = 0.1
+DUMP_INTERVAL = 60
+DUMP_PATH = os.path.join(os.environ.get('XDG_RUNTIME_DIR', '/tmp'), 'qtile-latency.json')
+
+
+# Latencies in power-of-two microsecond buckets: bucket n counts samples
+# below 2**n us, so 20 buckets reach past one second
+
+class Histogram:
+
+    def __init__(self):
+        self.buckets = [0] * 21
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        micros = int(seconds * 1e6)
+        self.buckets[min(micros.bit_length(), len(self.buckets) - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        wanted = fraction * self.count
+        seen = 0
+        for n, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= wanted:
+                return min((2 ** n) / 1e6, self.max)
+        return 0.0
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000,
+            'p50_ms': self.percentile(0.5) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+histograms = {}
+stalls = deque(maxlen=100)
+extra_stats = {}
+
+
+def record(name, seconds):
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    histogram.add(seconds)
+
+
+def timed(name, func):
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+    wrapper.instrumented = True
+    return wrapper
+
+
+# Wrap every handler subscribed to a qtile hook so far
+
+def wrap_hooks(hook):
+    for event, handlers in hook.subscriptions.items():
+        for i, handler in enumerate(handlers):
+            if not getattr(handler, 'instrumented', False):
+                name = 'hook:%s:%s' % (event, getattr(handler, '__name__', repr(handler)))
+                handlers[i] = timed(name, handler)
+
+
+# Time each source's refresh (its cost on the event loop) and every helper
+# command (wall time, off the loop)
+
+def wrap_sources(sources):
+    for name, source in sources.items():
+        source.refresh = timed('source:' + name, source.refresh)
+
+    run = poll.run
+
+    async def timed_run(argv, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await run(argv, *args, **kwargs)
+        finally:
+            record('cmd:' + os.path.basename(argv[0]), time.perf_counter() - start)
+
+    poll.run = timed_run
+
+
+# A heartbeat that notices when the loop was blocked for longer than the
+# threshold
+
+def _heartbeat(expected):
+    now = time.monotonic()
+    late = now - expected
+    if late > STALL_THRESHOLD:
+        stalls.append({'at': time.time(), 'ms': late * 1000})
+        record('loop:stall', late)
+    asyncio.get_event_loop().call_later(HEARTBEAT, _heartbeat, now + HEARTBEAT)
+
+
+def report():
+    return {
+        'latency': {name: h.summary() for name, h in sorted(histograms.items())},
+        'stalls': list(stalls),
+        'stats': {name: stats() for name, stats in extra_stats.items()},
+    }
+
+
+def dump(path=DUMP_PATH):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(report(), f, indent=1)
+    os.replace(tmp, path)
+
+
+# Read the numbers from a running session with
+#   qtile cmd-obj -o cmd -f eval -a "__import__('instrument').report()"
+# or from the JSON file dumped every minute.
+
+def install(hook, sources=None, stats=None):
+    wrap_hooks(hook)
+    wrap_sources(sources or {})
+    extra_stats.update(stats or {})
+
+    @hook.subscribe.startup_complete
+    def start_heartbeat():
+        _heartbeat(time.monotonic())
+        wheel.add(DUMP_INTERVAL, dump)
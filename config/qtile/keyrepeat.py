@@ -0,0 +1,50 @@
+import asyncio
+
+# Presses within this window are folded into one change
+WINDOW = 0.08
+
+
+# Collects auto-repeated hardware key presses and applies them once per
+# window. Consecutive presses of the same stepping action are summed into
+# one net change (seven volume-up repeats become a single +35), actions
+# without an amount such as mute are kept as they are, and everything is
+# applied in the order it was pressed.
+
+class ActionQueue:
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.events = 0
+        self.applied = 0
+        self.merged = 0
+        self._queue = []
+        self._handle = None
+
+    def push(self, action, amount=None):
+        self.events += 1
+        last = self._queue[-1] if self._queue else None
+        if amount is not None and last is not None and last[0] == action and last[1] is not None:
+            last[1] += amount
+            self.merged += 1
+        else:
+            self._queue.append([action, amount])
+        if self._handle is None:
+            self._handle = asyncio.get_event_loop().call_later(self.window, self.flush)
+
+    def flush(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        queue, self._queue = self._queue, []
+        for action, amount in queue:
+            self.applied += 1
+            if amount is None:
+                action()
+            elif amount:
+                action(amount)
+
+    def stats(self):
+        return {'events': self.events, 'applied': self.applied, 'merged': self.merged}
+
+
+keyqueue = ActionQueue()
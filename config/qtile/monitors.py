@@ -0,0 +1,98 @@
+import subprocess
+from collections import namedtuple
+
+Monitor = namedtuple('Monitor', 'name x y width height primary')
+
+_cache = None
+
+
+def _qtile_connection():
+    try:
+        from libqtile import qtile
+        return qtile.core.conn.conn
+    except Exception:
+        return None
+
+
+def _query_randr(conn):
+    import xcffib.randr
+
+    randr = conn(xcffib.randr.key)
+    setup = conn.get_setup()
+    root = setup.roots[conn.pref_screen].root
+    resources = randr.GetScreenResourcesCurrent(root).reply()
+    primary = randr.GetOutputPrimary(root).reply().output
+
+    # Send every request before waiting on any reply
+    infos = [(output, randr.GetOutputInfo(output, resources.config_timestamp))
+             for output in resources.outputs]
+    connected = []
+    for output, cookie in infos:
+        info = cookie.reply()
+        if info.connection == xcffib.randr.Connection.Connected:
+            connected.append((output, info))
+
+    crtcs = {info.crtc: randr.GetCrtcInfo(info.crtc, resources.config_timestamp)
+             for _, info in connected if info.crtc}
+    monitors = []
+    for output, info in connected:
+        name = bytes(info.name).decode()
+        if info.crtc:
+            crtc = crtcs[info.crtc].reply()
+            geometry = (crtc.x, crtc.y, crtc.width, crtc.height)
+        else:
+            geometry = (0, 0, 0, 0)
+        monitors.append(Monitor(name, *geometry, output == primary))
+    return monitors
+
+
+def _query_xrandr():
+    out = subprocess.run(['xrandr', '--query'], capture_output=True).stdout.decode()
+    monitors = []
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) < 2 or fields[1] != 'connected':
+            continue
+        primary = 'primary' in fields
+        geometry = (0, 0, 0, 0)
+        for field in fields[2:]:
+            if 'x' in field and '+' in field:
+                size, x, y = field.split('+', 2)
+                width, height = size.split('x')
+                geometry = (int(x), int(y), int(width), int(height))
+                break
+        monitors.append(Monitor(fields[0], *geometry, primary))
+    return monitors
+
+
+# Connected outputs, queried from the RandR extension over qtile's own X
+# connection when there is one. The answer is cached until refresh is
+# asked for, which the screen hotplug path does.
+
+def get_monitors(refresh=False):
+    global _cache
+    if _cache is not None and not refresh:
+        return _cache
+
+    monitors = None
+    conn = _qtile_connection()
+    try:
+        if conn is not None:
+            monitors = _query_randr(conn)
+        else:
+            import xcffib
+            conn = xcffib.connect()
+            try:
+                monitors = _query_randr(conn)
+            finally:
+                conn.disconnect()
+    except Exception:
+        # No xcffib or no RandR, fall back to asking xrandr
+        try:
+            monitors = _query_xrandr()
+        except OSError:
+            pass
+
+    # Always lay out at least one screen
+    _cache = monitors or [Monitor('default', 0, 0, 0, 0, True)]
+    return _cache
@@ -0,0 +1,184 @@
+import asyncio
+import fcntl
+import os
+import socket
+import struct
+
+import notify
+import poll
+from resolver import resolver
+from source import Source
+
+SYS_NET = '/sys/class/net'
+
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+SIOCGIFADDR = 0x8915
+
+# Link and address messages arrive in bursts, wait for them to settle
+SETTLE_DELAY = 0.2
+
+ICONS = {
+    'ethernet': " ",
+    'wifi':     " ",
+    None:       " ",
+}
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def interface_address(iface):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        packed = struct.pack('256s', iface.encode()[:15])
+        return socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, packed)[20:24])
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+
+# Pick the active connection the same way network.sh did: a wired link
+# wins over wireless, and a link only counts once it has an address.
+# address is injectable so the lookup can run against a fake sysfs tree.
+
+def read_network(root=SYS_NET, address=interface_address):
+    try:
+        interfaces = sorted(os.listdir(root))
+    except OSError:
+        return {'kind': None, 'iface': None, 'ip': None}
+
+    found = {}
+    for iface in interfaces:
+        path = os.path.join(root, iface)
+        # Skip loopback, bridges and other virtual devices
+        if not os.path.exists(os.path.join(path, 'device')):
+            continue
+        if _read(os.path.join(path, 'operstate')) != 'up':
+            continue
+        wireless = (os.path.isdir(os.path.join(path, 'wireless'))
+                    or os.path.exists(os.path.join(path, 'phy80211')))
+        kind = 'wifi' if wireless else 'ethernet'
+        if kind in found:
+            continue
+        ip = address(iface)
+        if ip:
+            found[kind] = {'kind': kind, 'iface': iface, 'ip': ip}
+
+    return found.get('ethernet') or found.get('wifi') or \
+        {'kind': None, 'iface': None, 'ip': None}
+
+
+class NetworkProvider(Source):
+
+    def __init__(self, root=SYS_NET, address=interface_address):
+        Source.__init__(self)
+        self.root = root
+        self.address = address
+        self.state = {'kind': None, 'iface': None, 'ip': None}
+        self.ssid = None
+        self.nmcli = True
+        self._sock = None
+        self._pending = None
+
+    # Passed to the resolver, whose cache is keyed on it, instead of it
+    # scanning sysfs again
+
+    def link(self):
+        return [self.state['iface'], self.state['ip']]
+
+    def start(self):
+        try:
+            self._sock = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            self._sock.bind(
+                (0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+            self._sock.setblocking(False)
+            self.loop.add_reader(self._sock.fileno(), self._on_netlink)
+        except (AttributeError, OSError):
+            self._sock = None
+        self.refresh()
+
+    def stop(self):
+        if self._sock is not None:
+            self.loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+    # Keeping the SSID saves asking NetworkManager again if the link is
+    # unchanged after a restart
+
+    def snapshot(self):
+        return dict(Source.snapshot(self), state=self.state, ssid=self.ssid)
+
+    def restore(self, state):
+        Source.restore(self, state)
+        self.state = state['state']
+        self.ssid = state['ssid']
+
+    def _on_netlink(self):
+        while True:
+            try:
+                self._sock.recv(65536)
+            except OSError:
+                break
+        if self._pending is None:
+            self._pending = self.loop.call_later(SETTLE_DELAY, self._settled)
+
+    def _settled(self):
+        self._pending = None
+        self.refresh()
+
+    def refresh(self):
+        state = read_network(self.root, self.address)
+        if state != self.state:
+            self.state = state
+            self.ssid = None
+            resolver.invalidate()
+            if state['kind'] is not None and self.nmcli:
+                self.loop.create_task(self._lookup_ssid(state))
+        self.publish(ICONS[self.state['kind']])
+
+    # The connection name is only known to NetworkManager, so ask it once
+    # per link change rather than on every tick. Without nmcli the interface
+    # name stands in for it.
+
+    async def _lookup_ssid(self, state):
+        try:
+            out = await poll.run(
+                ['nmcli', '-t', '-f', 'NAME,DEVICE', 'connection', 'show', '--active'])
+        except FileNotFoundError:
+            self.nmcli = False
+            return
+        except (OSError, asyncio.TimeoutError):
+            return
+        for line in out.splitlines():
+            name, _, device = line.rpartition(':')
+            if device == state['iface'] and state is self.state:
+                self.ssid = name.replace('\\:', ':')
+
+    async def _wan_address(self):
+        return await resolver.wan(link=self.link()) or ''
+
+    async def _show_info(self):
+        if self.state['kind'] is None:
+            connection = "No active connection."
+        else:
+            connection = "SSID: " + (self.ssid or self.state['iface']) + "\n" \
+                         "IP:   " + self.state['ip'] + "\n" \
+                         "WAN:  " + await self._wan_address()
+        notify.send(connection, icon='_', replaces_id=123, timeout=2000)
+
+    def show_info(self):
+        self.loop.create_task(self._show_info())
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import subprocess
+
+try:
+    from dbus_next import Message, MessageType, Variant
+    from dbus_next.aio import MessageBus
+except ImportError:
+    MessageBus = None
+
+logger = logging.getLogger(__name__)
+
+URGENCY = {'low': 0, 'normal': 1, 'critical': 2}
+
+
+# Desktop notifications over one long-lived session bus connection, in place
+# of forking dunstify/notify-send. Notifications that replace an id are
+# rate limited: while one is in flight, newer ones for the same id overwrite
+# each other and only the latest is sent once the server has answered.
+# When the bus can't be reached, the notification goes out through dunstify.
+
+class Notifier:
+
+    def __init__(self, bus_address=None):
+        self.bus_address = bus_address
+        self.sent = 0
+        self.dropped = 0
+        self._bus = None
+        self._lock = asyncio.Lock()
+        self._in_flight = set()
+        self._latest = {}
+
+    def send(self, summary, body='', app_name='qtile', icon='', replaces_id=0,
+             urgency=None, timeout=-1, value=None):
+        args = (app_name, replaces_id, icon, summary, body, urgency, timeout, value)
+        if MessageBus is None:
+            self._fork(*args)
+            return
+        if replaces_id:
+            if replaces_id in self._in_flight:
+                if replaces_id in self._latest:
+                    self.dropped += 1
+                self._latest[replaces_id] = args
+                return
+            self._in_flight.add(replaces_id)
+        asyncio.get_event_loop().create_task(self._send(args))
+
+    async def _send(self, args):
+        app_name, replaces_id, icon, summary, body, urgency, timeout, value = args
+        hints = {}
+        if urgency is not None:
+            hints['urgency'] = Variant('y', URGENCY[urgency])
+        if value is not None:
+            hints['value'] = Variant('i', int(value))
+        message = Message(
+            destination='org.freedesktop.Notifications',
+            path='/org/freedesktop/Notifications',
+            interface='org.freedesktop.Notifications',
+            member='Notify',
+            signature='susssasa{sv}i',
+            body=[app_name, replaces_id, icon, summary, body, [], hints, timeout])
+        try:
+            async with self._lock:
+                if self._bus is None:
+                    self._bus = await MessageBus(bus_address=self.bus_address).connect()
+            reply = await self._bus.call(message)
+            if reply.message_type == MessageType.ERROR:
+                # Most likely no notification daemon on the bus
+                logger.warning("can't send notification, forking dunstify: %s", reply.error_name)
+                self._fork(*args)
+            else:
+                self.sent += 1
+        except Exception as e:
+            logger.warning("can't send notification, forking dunstify: %s", e)
+            self._bus = None
+            self._fork(*args)
+        finally:
+            if replaces_id:
+                self._in_flight.discard(replaces_id)
+                latest = self._latest.pop(replaces_id, None)
+                if latest is not None:
+                    self._in_flight.add(replaces_id)
+                    await self._send(latest)
+
+    def _fork(self, app_name, replaces_id, icon, summary, body, urgency, timeout, value):
+        cmd = ["dunstify", "-a", app_name, "-t", str(timeout)]
+        if icon:
+            cmd += ["-i", icon]
+        if replaces_id:
+            cmd += ["-r", str(replaces_id)]
+        if urgency is not None:
+            cmd += ["-u", urgency]
+        if value is not None:
+            cmd += ["-h", "int:value:%d" % value]
+        cmd += [summary] + ([body] if body else [])
+        try:
+            subprocess.Popen(cmd)
+        except OSError as e:
+            logger.warning("can't run dunstify: %s", e)
+
+
+notifier = Notifier()
+send = notifier.send
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from collections import deque
+
+# New windows are matched this long after they appear, so a burst of
+# restored windows is handled in one go
+PLACEMENT_DELAY = 0.04
+
+
+# Defers the follow-on-auto-move of new clients without blocking the event
+# loop, and switches to the target group once per burst instead of once per
+# window. Also measures how long each window takes from map to focus.
+
+class PlacementScheduler:
+
+    def __init__(self, match, delay=PLACEMENT_DELAY, samples=256):
+        self.match = match
+        self.delay = delay
+        self.latencies = deque(maxlen=samples)
+        self._pending = []
+        self._handle = None
+        self._mapped = {}
+
+    def client_new(self, client):
+        self._mapped[client.wid] = time.monotonic()
+        self._pending.append(client)
+        if self._handle is None:
+            loop = asyncio.get_event_loop()
+            self._handle = loop.call_later(self.delay, self._flush)
+
+    def _flush(self):
+        self._handle = None
+        pending, self._pending = self._pending, []
+        target = None
+        qtile = None
+        for client in pending:
+            name = self.match(client)
+            if name is not None:
+                target = name
+                qtile = client.qtile
+        if target is not None:
+            # there can be multiple instances of a group
+            qtile.groups_map[target].cmd_toscreen(toggle=False)
+
+    def client_focus(self, client):
+        start = self._mapped.pop(client.wid, None)
+        if start is not None:
+            self.latencies.append(time.monotonic() - start)
+
+    def client_killed(self, client):
+        self._mapped.pop(client.wid, None)
+        if client in self._pending:
+            self._pending.remove(client)
+
+    def stats(self):
+        samples = sorted(self.latencies)
+        if not samples:
+            return {'count': 0}
+        return {
+            'count': len(samples),
+            'mean': sum(samples) / len(samples),
+            'p50': samples[len(samples) // 2],
+            'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            'max': samples[-1],
+        }
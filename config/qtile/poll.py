@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import os
+import signal
+
+from source import Source
+from timer import wheel
+
+logger = logging.getLogger(__name__)
+
+# At most this many helper processes run at once, across every source
+MAX_CHILDREN = 4
+DEFAULT_TIMEOUT = 5
+
+_children = None
+
+
+def _limit():
+    global _children
+    if _children is None:
+        _children = asyncio.Semaphore(MAX_CHILDREN)
+    return _children
+
+
+async def run(argv, timeout=DEFAULT_TIMEOUT, returncodes=(0,)):
+    async with _limit():
+        proc = await asyncio.create_subprocess_exec(
+            *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True)
+        try:
+            out, _ = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            # Scripts fork helpers of their own, take down the whole group
+            os.killpg(proc.pid, signal.SIGKILL)
+            await proc.wait()
+            raise
+    if proc.returncode not in returncodes:
+        raise OSError("%s exited with %d" % (argv[0], proc.returncode))
+    return out.decode()
+
+
+# A source whose value comes from poll(), a coroutine (a helper process, or
+# work handed to a thread), run every interval seconds on the timer wheel or
+# only on demand when interval is None, without ever blocking the event
+# loop. A value restored from the snapshot that is less than an interval
+# old skips the first run. Runs never overlap: refreshes while one is running are folded into
+# a single run after it. A run that fails or times out keeps showing the
+# last good value.
+
+class PollSource(Source):
+
+    def __init__(self, interval=None, timeout=DEFAULT_TIMEOUT):
+        Source.__init__(self)
+        self.interval = interval
+        self.max_age = interval or 0
+        self.timeout = timeout
+        self._task = None
+        self._again = False
+
+    async def poll(self):
+        raise NotImplementedError
+
+    def start(self):
+        if not self.fresh():
+            self.refresh()
+        if self.interval:
+            wheel.add(self.interval, self.refresh)
+
+    def stop(self):
+        wheel.remove(self.refresh)
+
+    def refresh(self):
+        if self._task is not None and not self._task.done():
+            self._again = True
+            return
+        self._task = self.loop.create_task(self._update())
+
+    async def _update(self):
+        self._again = True
+        while self._again:
+            self._again = False
+            try:
+                value = await asyncio.wait_for(self.poll(), self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning("poll of %s timed out", type(self).__name__)
+                continue
+            except Exception:
+                logger.exception("poll of %s failed", type(self).__name__)
+                continue
+            self.publish(value)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+import asyncio
+import ipaddress
+import json
+import os
+import random
+import struct
+import sys
+import time
+
+CACHE_PATH = os.path.join(os.environ.get('XDG_RUNTIME_DIR', '/tmp'), 'qtile-resolver.json')
+
+# Every probe gets this long, and they all run at the same time
+PROBE_TIMEOUT = 1.5
+WAN_TTL = 600
+ONLINE_TTL = 30
+# Failures are cached briefly so a flapping link is retried soon
+FAILURE_TTL = 5
+
+# Any of these accepting a connection means we're online
+PROBES = [('archlinux.org', 443), ('google.com', 443), ('bitbucket.org', 443),
+          ('github.com', 443), ('sourceforge.net', 443)]
+# The OpenDNS resolvers answer myip.opendns.com with the address asking
+DNS_SERVERS = [('208.67.222.222', 53), ('208.67.220.220', 53)]
+HTTP_SOURCES = [('ipinfo.io', 80, '/ip')]
+
+
+def dns_query(name, qid):
+    labels = b''.join(bytes([len(part)]) + part.encode() for part in name.split('.'))
+    return struct.pack('>HHHHHH', qid, 0x0100, 1, 0, 0, 0) + labels + b'\0' + struct.pack('>HH', 1, 1)
+
+
+def _skip_name(packet, pos):
+    while True:
+        length = packet[pos]
+        if length & 0xc0 == 0xc0:
+            return pos + 2
+        if length == 0:
+            return pos + 1
+        pos += length + 1
+
+
+# First A record of a response to dns_query()
+
+def parse_answer(packet, qid):
+    rid, flags, questions, answers = struct.unpack_from('>HHHH', packet)
+    if rid != qid or not flags & 0x8000 or flags & 0x000f:
+        raise ValueError("bad DNS response")
+    pos = 12
+    for _ in range(questions):
+        pos = _skip_name(packet, pos) + 4
+    for _ in range(answers):
+        pos = _skip_name(packet, pos)
+        rtype, rclass, _, length = struct.unpack_from('>HHIH', packet, pos)
+        pos += 10
+        if rtype == 1 and rclass == 1 and length == 4:
+            return str(ipaddress.IPv4Address(packet[pos:pos + 4]))
+        pos += length
+    raise ValueError("no A record")
+
+
+class _Reply(asyncio.DatagramProtocol):
+
+    def __init__(self):
+        self.answer = asyncio.get_event_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        if not self.answer.done():
+            self.answer.set_result(data)
+
+    def error_received(self, exc):
+        if not self.answer.done():
+            self.answer.set_exception(exc)
+
+
+async def query_dns(server, name='myip.opendns.com'):
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_datagram_endpoint(_Reply, remote_addr=server)
+    try:
+        qid = random.getrandbits(16)
+        transport.sendto(dns_query(name, qid))
+        return parse_answer(await protocol.answer, qid)
+    finally:
+        transport.close()
+
+
+# The caller's timeout bounds the read, which goes on until the server
+# closes the connection
+
+async def query_http(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(('GET %s HTTP/1.0\r\nHost: %s\r\nUser-Agent: curl\r\n'
+                      'Connection: close\r\n\r\n' % (path, host)).encode())
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    if head.split(b' ', 2)[1:2] != [b'200']:
+        raise ValueError("HTTP error from " + host)
+    return str(ipaddress.ip_address(body.strip().decode()))
+
+
+async def connect(host, port):
+    _, writer = await asyncio.open_connection(host, port)
+    writer.close()
+    return True
+
+
+async def first_success(coros, timeout):
+    tasks = [asyncio.ensure_future(asyncio.wait_for(coro, timeout)) for coro in coros]
+    try:
+        for done in asyncio.as_completed(tasks):
+            try:
+                result = await done
+            except (OSError, ValueError, IndexError, struct.error, asyncio.TimeoutError):
+                continue
+            if result:
+                return result
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def current_link():
+    from network import read_network
+    state = read_network()
+    return [state['iface'], state['ip']]
+
+
+def _read_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(path, cache):
+    try:
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+# Connectivity and WAN address, probed concurrently with strict timeouts
+# (the first answer wins) and cached with a TTL. The cache is kept in
+# memory and mirrored to a file shared by qtile and the rofi scripts, which
+# is read once per process; it is dropped when the link (interface or LAN
+# address) it was filled on is no longer the current one. Callers that
+# already know the link pass it in, otherwise it is read with link(). The
+# file is read and written in a worker thread, so qtile's event loop never
+# waits on it.
+
+class Resolver:
+
+    def __init__(self, path=CACHE_PATH, probes=PROBES, dns_servers=DNS_SERVERS,
+                 http_sources=HTTP_SOURCES, timeout=PROBE_TIMEOUT, link=current_link):
+        self.path = path
+        self.probes = probes
+        self.dns_servers = dns_servers
+        self.http_sources = http_sources
+        self.timeout = timeout
+        self.link = link
+        self._cache = None
+        self._inflight = {}
+
+    async def _load(self, link=None):
+        loop = asyncio.get_event_loop()
+        if self._cache is None:
+            self._cache = await loop.run_in_executor(None, _read_cache, self.path)
+        if link is None:
+            link = self.link()
+        if self._cache.get('link') != link:
+            self._cache = {'link': link}
+        return self._cache
+
+    async def _store(self, name, value, ttl, link=None):
+        cache = await self._load(link)
+        cache[name] = [value, time.time() + ttl]
+        await asyncio.get_event_loop().run_in_executor(None, _write_cache, self.path, dict(cache))
+
+    async def cached(self, name, link=None):
+        entry = (await self._load(link)).get(name)
+        if entry is not None and entry[1] > time.time():
+            return entry
+        return None
+
+    def invalidate(self):
+        self._cache = {}
+        try:
+            asyncio.get_running_loop().run_in_executor(None, _unlink, self.path)
+        except RuntimeError:
+            _unlink(self.path)
+
+    async def _resolve(self, name, lookup, ttl, refresh, link):
+        if link is None:
+            link = self.link()
+        entry = None if refresh else await self.cached(name, link)
+        if entry is not None:
+            return entry[0]
+        # Callers asking at the same time share one lookup
+        task = self._inflight.get(name)
+        if task is None:
+            task = self._inflight[name] = asyncio.ensure_future(lookup())
+            task.add_done_callback(lambda _: self._inflight.pop(name, None))
+        value = await asyncio.shield(task)
+        await self._store(name, value, ttl if value else FAILURE_TTL, link)
+        return value
+
+    async def online(self, refresh=False, link=None):
+        def lookup():
+            return first_success([connect(*probe) for probe in self.probes], self.timeout)
+        return bool(await self._resolve('online', lookup, ONLINE_TTL, refresh, link))
+
+    async def wan(self, refresh=False, link=None):
+        def lookup():
+            return first_success(
+                [query_dns(server) for server in self.dns_servers]
+                + [query_http(*source) for source in self.http_sources], self.timeout)
+        return await self._resolve('wan', lookup, WAN_TTL, refresh, link)
+
+
+resolver = Resolver()
+
+
+# For the rofi scripts:
+#   resolver.py online        exit status 0 when online
+#   resolver.py wan           print the WAN address
+#   resolver.py lan           print the LAN address
+#   add --refresh to skip the cache
+
+def main():
+    args = sys.argv[1:]
+    refresh = '--refresh' in args
+    command = next((arg for arg in args if not arg.startswith('-')), 'wan')
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    if command == 'online':
+        sys.exit(0 if loop.run_until_complete(resolver.online(refresh)) else 1)
+    elif command == 'wan':
+        address = loop.run_until_complete(resolver.wan(refresh))
+        print(address or "Not Available")
+        sys.exit(0 if address else 1)
+    elif command == 'lan':
+        address = current_link()[1]
+        print(address or "Not Available")
+        sys.exit(0 if address else 1)
+    sys.exit("usage: resolver.py online|wan|lan [--refresh]")
+
+
+if __name__ == '__main__':
+    main()
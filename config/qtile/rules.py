@@ -0,0 +1,79 @@
+from libqtile.layout.floating import Floating
+
+# Properties that can be looked up by value
+INDEXED = ('wm_class', 'wm_type', 'title')
+
+# Longer strings would put too many substrings in the tables; rules on them
+# are compared one by one
+MAX_INDEXED = 64
+
+
+def substrings(value):
+    return {value[i:j] for i in range(len(value) + 1) for j in range(i, len(value) + 1)}
+
+
+# Compiles an ordered list of (target, Match) rules into hash tables so a
+# window is matched with a few dict lookups instead of a compare() per rule.
+# Match compares strings as an include match (the window's value is in the
+# rule's string, and for wm_class any of the classes is), so a rule's table
+# entries are every substring of its value: the lookup is the same match,
+# an empty title included. Rules on a single indexed property with a plain
+# string value go into the tables; anything else (regexes, func, several
+# properties) is kept in a short list and still compared one by one. The
+# first matching rule in the original order wins, as before.
+
+class RuleIndex:
+
+    def __init__(self, rules, compiled=None):
+        if compiled is None:
+            compiled = self.compile(rules)
+        self.tables, positions = compiled
+        self.fallback = [(position, rules[position][0], rules[position][1])
+                         for position in positions]
+
+    # The tables plus the positions of the rules left out of them; plain
+    # data, so it can be cached between restarts
+
+    @staticmethod
+    def compile(rules):
+        tables = {key: {} for key in INDEXED}
+        positions = []
+        for position, (target, match) in enumerate(rules):
+            properties = getattr(match, '_rules', {})
+            if len(properties) == 1:
+                (key, value), = properties.items()
+                if key in INDEXED and isinstance(value, str) and len(value) <= MAX_INDEXED:
+                    for part in substrings(value):
+                        tables[key].setdefault(part, (position, target))
+                    continue
+            positions.append(position)
+        return tables, positions
+
+    def _candidates(self, client):
+        for value in client.get_wm_class() or ():
+            yield self.tables['wm_class'].get(value)
+        yield self.tables['wm_type'].get(client.get_wm_type())
+        yield self.tables['title'].get(client.name)
+
+    def lookup(self, client):
+        best = None
+        for hit in self._candidates(client):
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+        for position, target, match in self.fallback:
+            if best is not None and position > best[0]:
+                break
+            if match.compare(client):
+                best = (position, target)
+                break
+        return best[1] if best is not None else None
+
+
+class IndexedFloating(Floating):
+
+    def __init__(self, compiled=None, **config):
+        Floating.__init__(self, **config)
+        self.rule_index = RuleIndex([(True, rule) for rule in self.float_rules], compiled)
+
+    def match(self, win):
+        return self.rule_index.lookup(win) is not None
@@ -0,0 +1,308 @@
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import notify
+import poll
+
+logger = logging.getLogger(__name__)
+
+# Same naming as the old scrot script
+OUTPUT = os.path.expanduser('~/Pictures/screenshots/%Y-%m-%d-%T-screenshot.png')
+
+# PNG encoding runs here, off the event loop; zlib releases the GIL
+WORKERS = 2
+COMPRESSION = 6
+
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+_libc = None
+
+
+def _shm_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        _libc.shmat.restype = ctypes.c_void_p
+        _libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        _libc.shmdt.argtypes = [ctypes.c_void_p]
+        _libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    return _libc
+
+
+# A SysV shared memory segment attached to both the X server and this
+# process. view() is a memoryview straight over the mapping, not a copy.
+
+class _Segment:
+
+    def __init__(self, conn, shm, size):
+        libc = _shm_libc()
+        shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if shmid < 0:
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        addr = libc.shmat(shmid, None, 0)
+        if addr is None or addr == ctypes.c_void_p(-1).value:
+            libc.shmctl(shmid, IPC_RMID, None)
+            raise OSError(ctypes.get_errno(), "shmat failed")
+        self.conn = conn
+        self.shm = shm
+        self.addr = addr
+        self.size = size
+        self.id = conn.generate_id()
+        shm.Attach(self.id, shmid, False)
+        # the segment goes away once both sides have detached
+        conn.core.GetInputFocus().reply()
+        libc.shmctl(shmid, IPC_RMID, None)
+
+    def view(self, size):
+        return memoryview((ctypes.c_char * self.size).from_address(self.addr)).cast('B')[:size]
+
+    def close(self):
+        try:
+            self.shm.Detach(self.id)
+            self.conn.flush()
+        except Exception:
+            pass
+        _shm_libc().shmdt(self.addr)
+
+
+# Grabs 32 bits per pixel ZPixmap images of the root window. With the
+# MIT-SHM extension the server writes the pixels straight into a shared
+# memory segment and the caller gets a view of it, so nothing is copied
+# on the way; without it, a plain GetImage is used. grab() also returns a
+# release function: until it is called the segment belongs to the caller
+# (an encoder reading it), after that it is reused for the next capture.
+
+class Grabber:
+
+    # Idle segments kept for reuse
+    KEEP = 2
+
+    def __init__(self, conn):
+        import xcffib.xproto
+
+        self.conn = conn
+        screen = conn.get_setup().roots[conn.pref_screen]
+        self.root = screen.root
+        self.width = screen.width_in_pixels
+        self.height = screen.height_in_pixels
+        self.zpixmap = xcffib.xproto.ImageFormat.ZPixmap
+        self.shm = None
+        self._free = []
+        try:
+            import xcffib.shm
+            self.shm = conn(xcffib.shm.key)
+            self.shm.QueryVersion().reply()
+        except Exception as e:
+            logger.info("no MIT-SHM, screenshots go over the socket: %s", e)
+            self.shm = None
+
+    def _take(self, size):
+        for segment in self._free:
+            if segment.size >= size:
+                self._free.remove(segment)
+                return segment
+        return _Segment(self.conn, self.shm, size)
+
+    def _give(self, segment):
+        if self.shm is None:
+            segment.close()
+            return
+        self._free.append(segment)
+        # keep the biggest ones
+        self._free.sort(key=lambda s: s.size, reverse=True)
+        while len(self._free) > self.KEEP:
+            self._free.pop().close()
+
+    def clip(self, x, y, width, height):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        return x0, y0, max(x1 - x0, 0), max(y1 - y0, 0)
+
+    # (pixels, width, height, release)
+
+    def grab(self, x=0, y=0, width=None, height=None):
+        x, y, width, height = self.clip(
+            x, y, self.width if width is None else width, self.height if height is None else height)
+        if not width or not height:
+            raise ValueError("empty region")
+        size = width * height * 4
+        if self.shm is not None:
+            segment = None
+            try:
+                segment = self._take(size)
+                self.shm.GetImage(self.root, x, y, width, height, 0xffffffff,
+                                  self.zpixmap, segment.id, 0).reply()
+                return segment.view(size), width, height, lambda: self._give(segment)
+            except Exception as e:
+                logger.warning("MIT-SHM capture failed, falling back: %s", e)
+                if segment is not None:
+                    segment.close()
+                self.close()
+                self.shm = None
+        reply = self.conn.core.GetImage(
+            self.zpixmap, self.root, x, y, width, height, 0xffffffff).reply()
+        return reply.data.buf(), width, height, lambda: None
+
+    def close(self):
+        for segment in self._free:
+            segment.close()
+        self._free = []
+
+
+def _chunk(kind, data):
+    body = kind + data
+    return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body))
+
+
+# BGRX pixels (the X server's 32 bpp ZPixmap) to an RGB PNG. The pixels
+# are copied out of the shared segment once, here in the worker, since
+# slicing bytes is much faster than slicing a memoryview; channels are then
+# swapped with strided slices and every row gets filter type 0, so the only
+# real work is zlib's.
+
+def encode_png(data, width, height, level=COMPRESSION):
+    data = bytes(data)
+    rgb = bytearray(width * height * 3)
+    rgb[0::3] = data[2::4]
+    rgb[1::3] = data[1::4]
+    rgb[2::3] = data[0::4]
+    stride = width * 3
+    raw = b''.join(b'\0' + rgb[i:i + stride] for i in range(0, len(rgb), stride))
+    return (b'\x89PNG\r\n\x1a\n'
+            + _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + _chunk(b'IDAT', zlib.compress(raw, level))
+            + _chunk(b'IEND', b''))
+
+
+def write_png(path, data, width, height):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    png = encode_png(data, width, height)
+    tmp = path + '.part'
+    with open(tmp, 'wb') as f:
+        f.write(png)
+    os.replace(tmp, path)
+    return path
+
+
+def next_path(output=OUTPUT, taken=()):
+    path = time.strftime(output)
+    base, ext = os.path.splitext(path)
+    n = 0
+    while os.path.exists(path) or path in taken:
+        n += 1
+        path = '%s_%03d%s' % (base, n, ext)
+    return path
+
+
+# Full screen, focused window and region screenshots for the key
+# bindings. The capture is one round trip on the event loop; encoding and
+# writing happen in a worker thread, and the notification is sent when
+# the file is there.
+
+class Screenshots:
+
+    def __init__(self, output=OUTPUT, workers=WORKERS, samples=64):
+        self.output = output
+        self.workers = workers
+        self.latencies = deque(maxlen=samples)
+        self._grabber = None
+        self._pool = None
+        self._writing = set()
+
+    def _shoot(self, qtile, x=0, y=0, width=None, height=None):
+        if self._grabber is None:
+            self._grabber = Grabber(qtile.core.conn.conn)
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='screenshot')
+        start = time.perf_counter()
+        try:
+            data, width, height, release = self._grabber.grab(x, y, width, height)
+        except Exception as e:
+            logger.warning("screenshot failed: %s", e)
+            return
+        self.latencies.append(time.perf_counter() - start)
+
+        # shots within the same second get numbered, even while encoding
+        path = next_path(self.output, self._writing)
+        self._writing.add(path)
+        loop = asyncio.get_event_loop()
+        future = self._pool.submit(write_png, path, data, width, height)
+        future.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(self._written, f, path, release))
+
+    def _written(self, future, path, release):
+        release()
+        self._writing.discard(path)
+        try:
+            future.result()
+        except Exception as e:
+            logger.warning("can't save screenshot: %s", e)
+            notify.send("Screenshot failed", str(e))
+            return
+        notify.send("Screenshot Taken!")
+
+    def full(self, qtile):
+        self._shoot(qtile)
+
+    # The focused window with its border, like scrot --focused --border
+
+    def window(self, qtile):
+        window = qtile.current_window
+        if window is None:
+            return self.full(qtile)
+        border = getattr(window, 'borderwidth', 0)
+        self._shoot(qtile, window.x, window.y, window.width + 2 * border, window.height + 2 * border)
+
+    def select(self, qtile):
+        asyncio.get_event_loop().create_task(self._select(qtile))
+
+    async def _select(self, qtile):
+        try:
+            out = await poll.run(['slop', '-f', '%x %y %w %h'], timeout=120)
+        except asyncio.TimeoutError:
+            return
+        except FileNotFoundError:
+            await self._scrot_select()
+            return
+        except OSError:
+            return  # selection cancelled
+        try:
+            x, y, width, height = (int(n) for n in out.split())
+        except ValueError:
+            return
+        self._shoot(qtile, x, y, width, height)
+
+    # Without slop, scrot picks the region and saves the shot itself, as
+    # the old script did
+
+    async def _scrot_select(self):
+        path = next_path(self.output, self._writing)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            await poll.run(['scrot', path, '--select', '--line', 'mode=edge'], timeout=120)
+        except FileNotFoundError:
+            logger.warning("region screenshots need slop or scrot")
+            return
+        except (OSError, asyncio.TimeoutError):
+            return  # selection cancelled
+        notify.send("Screenshot Taken!")
+
+    def stats(self):
+        samples = sorted(self.latencies)
+        if not samples:
+            return {'count': 0}
+        return {
+            'count': len(samples),
+            'mean': sum(samples) / len(samples),
+            'p50': samples[len(samples) // 2],
+            'max': samples[-1],
+        }
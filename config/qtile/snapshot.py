@@ -0,0 +1,84 @@
+import logging
+import os
+import pickle
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'qtile', 'snapshot.pickle')
+
+# Window ids are only meaningful within one X session, so windows are only
+# put back from a snapshot taken this recently (i.e. by a restart)
+RESTART_WINDOW = 120
+
+
+# Carries state across qtile restarts: the last value of every source (so
+# bars paint complete straight away and sources with a fresh enough value
+# skip their first poll), the group history, and which group each window
+# and the focus were on. Written on shutdown, read at config load.
+
+class Snapshot:
+
+    def __init__(self, sources, history, path=SNAPSHOT_PATH):
+        self.sources = sources
+        self.history = history
+        self.path = path
+        self.windows = {}
+        self.focus = None
+
+    def restore(self):
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, ValueError, TypeError):
+            return
+        try:
+            for name, source in self.sources.items():
+                if name in state['sources']:
+                    source.restore(state['sources'][name])
+            self.history.restore(state['history'])
+            if time.time() - state['taken'] < RESTART_WINDOW:
+                self.windows = state['windows']
+                self.focus = state['focus']
+        except (KeyError, TypeError) as e:
+            logger.warning("ignoring unusable snapshot: %s", e)
+
+    # Put a window qtile is managing again back on its group. Returns
+    # whether the window was known, so it isn't placed by the rules again.
+
+    def restore_window(self, client):
+        name = self.windows.pop(client.wid, None)
+        if name is None:
+            return False
+        if client.group is None or client.group.name != name:
+            client.togroup(name)
+        return True
+
+    # Called once the existing windows have all been managed
+
+    def restore_focus(self, qtile):
+        window = qtile.windows_map.get(self.focus)
+        if window is not None and window.group is qtile.current_group:
+            window.group.focus(window)
+        self.windows = {}
+        self.focus = None
+
+    def save(self, qtile):
+        current = qtile.current_window
+        state = {
+            'taken': time.time(),
+            'sources': {name: source.snapshot() for name, source in self.sources.items()},
+            'history': self.history.snapshot(),
+            'windows': {wid: window.group.name for wid, window in qtile.windows_map.items()
+                        if getattr(window, 'group', None) is not None},
+            'focus': current.wid if current is not None else None,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except (OSError, pickle.PickleError) as e:
+            logger.warning("can't save snapshot: %s", e)
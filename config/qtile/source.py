@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+
+from timer import wheel
+
+logger = logging.getLogger(__name__)
+
+
+# A data source computes a value once and pushes it to every subscriber.
+# Widgets never poll on their own; they redraw when their source publishes.
+
+class Source:
+
+    # A restored value younger than this many seconds stands in for the
+    # first refresh after a restart
+    max_age = 0
+
+    def __init__(self):
+        self.value = None
+        self.updated = None
+        self._subscribers = []
+        self._started = False
+
+    @property
+    def loop(self):
+        return asyncio.get_event_loop()
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        if self.value is not None:
+            callback(self.value)
+        if not self._started:
+            self._started = True
+            self.start()
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+        if not self._subscribers and self._started:
+            self._started = False
+            self.stop()
+
+    # Called when the first subscriber arrives / the last one leaves
+
+    def start(self):
+        self.refresh()
+
+    def stop(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def fresh(self):
+        return self.updated is not None and time.time() - self.updated < self.max_age
+
+    # State carried across restarts by snapshot.py
+
+    def snapshot(self):
+        return {'value': self.value, 'updated': self.updated}
+
+    def restore(self, state):
+        self.value = state['value']
+        self.updated = state['updated']
+
+    def publish(self, value):
+        self.updated = time.time()
+        if value == self.value:
+            return
+        self.value = value
+        # One broken widget doesn't keep the others from updating
+        for callback in list(self._subscribers):
+            try:
+                callback(value)
+            except Exception:
+                logger.exception("subscriber %r of %s failed", callback, type(self).__name__)
+
+
+# Value of a plain function, re-evaluated every period seconds on the
+# shared timer wheel. Set period to how often the output can really change.
+
+class FuncSource(Source):
+
+    def __init__(self, func, period=None):
+        Source.__init__(self)
+        self.func = func
+        self.period = period
+
+    def start(self):
+        self.refresh()
+        if self.period:
+            wheel.add(self.period, self.refresh)
+
+    def stop(self):
+        wheel.remove(self.refresh)
+
+    def refresh(self):
+        self.publish(self.func())
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+import os
+import pickle
+import time
+
+logger = logging.getLogger(__name__)
+
+# The clock starts when config.py imports this module, which it does first
+_origin = time.perf_counter()
+
+CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'qtile', 'compiled')
+TIMELINE_PATH = os.path.join(os.environ.get('XDG_RUNTIME_DIR', '/tmp'), 'qtile-startup.json')
+
+timeline = []
+
+
+def mark(name):
+    timeline.append((name, (time.perf_counter() - _origin) * 1000))
+
+
+# Record the first bar paint and write the timeline out. Called from
+# startup_complete; bar draws queued during startup run before this.
+
+def finish():
+    def painted():
+        mark('first bar paint')
+        steps = []
+        previous = 0.0
+        for name, at in timeline:
+            steps.append({'step': name, 'at_ms': at, 'took_ms': at - previous})
+            previous = at
+        logger.info("startup: %s", ", ".join("%s %.1f ms" % (s['step'], s['took_ms']) for s in steps))
+        try:
+            with open(TIMELINE_PATH, 'w') as f:
+                json.dump(steps, f, indent=1)
+        except OSError:
+            pass
+    asyncio.get_event_loop().call_soon(painted)
+
+
+def _mtimes(paths):
+    return tuple(os.stat(path).st_mtime_ns for path in paths)
+
+
+# Result of build(), pickled under the cache directory and reused for as
+# long as none of paths has been modified since
+
+def cached(name, build, *paths):
+    path = os.path.join(CACHE_DIR, name + '.pickle')
+    try:
+        key = _mtimes(paths)
+    except OSError:
+        return build()
+    try:
+        with open(path, 'rb') as f:
+            stored_key, value = pickle.load(f)
+        if stored_key == key:
+            return value
+    except (OSError, pickle.PickleError, EOFError, ValueError, TypeError):
+        pass
+
+    value = build()
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump((key, value), f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("can't cache %s: %s", name, e)
+    return value
@@ -0,0 +1,111 @@
+import math
+import mmap
+import os
+import struct
+import time
+
+TELEMETRY_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'qtile', 'battery.ring')
+
+# About 17 hours of history at one sample a minute
+CAPACITY = 1024
+
+# Time constant of the discharge rate average: a reading this old has
+# 1/e of the weight of the current one
+TAU = 300
+
+MAGIC = b'BAT1'
+# magic, capacity, next slot, samples stored, averaged rate (uW), time of the rate
+HEADER = struct.Struct('<4sIIIdd')
+# timestamp, energy (uWh), power (uW); -1 where the battery doesn't say.
+# Batteries that only report charge give uAh and uA, the ratio is the same.
+SAMPLE = struct.Struct('<dii')
+
+
+# Battery samples in a fixed-size ring of packed structs in an mmap'd
+# file, so the history and the averaged discharge rate survive restarts.
+# Adding a sample is one struct.pack_into and one EWMA step, whatever the
+# length of the history.
+
+class Telemetry:
+
+    def __init__(self, path=TELEMETRY_PATH, capacity=CAPACITY, tau=TAU, readonly=False):
+        self.path = path
+        self.tau = tau
+        size = HEADER.size + capacity * SAMPLE.size
+        if readonly:
+            with open(path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.capacity = HEADER.unpack_from(self._map)[1]
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.capacity = capacity
+        magic, stored_capacity = HEADER.unpack_from(self._map)[:2]
+        if magic != MAGIC or stored_capacity != capacity:
+            HEADER.pack_into(self._map, 0, MAGIC, capacity, 0, 0, 0.0, 0.0)
+
+    def _header(self):
+        return HEADER.unpack_from(self._map)[2:]
+
+    @property
+    def rate(self):
+        return self._header()[2]
+
+    def add(self, timestamp, energy, power, discharging):
+        head, count, rate, rate_at = self._header()
+        SAMPLE.pack_into(self._map, HEADER.size + head * SAMPLE.size, timestamp,
+                         -1 if energy is None else energy, -1 if power is None else power)
+        head = (head + 1) % self.capacity
+        count = min(count + 1, self.capacity)
+
+        if discharging and power:
+            if not rate:
+                rate = float(power)
+            elif timestamp > rate_at:
+                alpha = 1 - math.exp(-(timestamp - rate_at) / self.tau)
+                rate += alpha * (power - rate)
+            rate_at = max(rate_at, timestamp)
+        HEADER.pack_into(self._map, 0, MAGIC, self.capacity, head, count, rate, rate_at)
+
+    # Seconds left at the averaged discharge rate
+
+    def estimate(self, energy):
+        rate = self.rate
+        if not energy or rate <= 0:
+            return None
+        return int(energy * 3600 / rate)
+
+    def _sample(self, i):
+        timestamp, energy, power = SAMPLE.unpack_from(
+            self._map, HEADER.size + (i % self.capacity) * SAMPLE.size)
+        return timestamp, None if energy < 0 else energy, None if power < 0 else power
+
+    def latest(self):
+        head, count = self._header()[:2]
+        return self._sample(head - 1) if count else None
+
+    # Oldest first, as (timestamp, energy, power)
+
+    def samples(self):
+        head, count = self._header()[:2]
+        for i in range(head - count, head):
+            yield self._sample(i)
+
+    def close(self):
+        self._map.close()
+
+
+if __name__ == '__main__':
+    telemetry = Telemetry(readonly=True)
+    for timestamp, energy, power in telemetry.samples():
+        print(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)), energy, power)
+    print("averaged discharge rate: %.2f W" % (telemetry.rate / 1e6))
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Wakeups within this many seconds of each other are served together
+SLACK = 0.05
+
+
+def _utcoffset():
+    return -time.altzone if time.localtime().tm_isdst > 0 else -time.timezone
+
+
+# One timer for the whole bar. Every periodic job is due on a wall-clock
+# multiple of its period (a 60 s job runs at hh:mm:00), and all jobs that are
+# due are run from the same wakeup, so the event loop wakes up once per
+# distinct boundary rather than once per widget per second.
+
+class TimerWheel:
+
+    def __init__(self):
+        self.jobs = []
+        self.wakeups = 0
+        self._handle = None
+
+    @staticmethod
+    def next_boundary(period, now):
+        local = now + _utcoffset()
+        return (local // period + 1) * period - _utcoffset()
+
+    def add(self, period, callback):
+        self.jobs.append([self.next_boundary(period, time.time()), period, callback])
+        self._reschedule()
+
+    def remove(self, callback):
+        self.jobs = [job for job in self.jobs if job[2] != callback]
+        self._reschedule()
+
+    def _reschedule(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if not self.jobs:
+            return
+        due, period, _ = min(self.jobs, key=lambda job: job[0])
+        # Never sleep longer than a period, in case the wall clock jumps
+        delay = min(max(due - time.time(), 0), period)
+        self._handle = asyncio.get_event_loop().call_later(delay, self._tick)
+
+    def _tick(self):
+        self._handle = None
+        self.wakeups += 1
+        now = time.time()
+        for job in list(self.jobs):
+            due, period, callback = job
+            if due <= now + SLACK:
+                job[0] = self.next_boundary(period, now + SLACK)
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("timer job %r failed", callback)
+            elif due - now > period:
+                # The clock went back, line up again
+                job[0] = self.next_boundary(period, now)
+        self._reschedule()
+
+
+wheel = TimerWheel()
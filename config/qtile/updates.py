@@ -0,0 +1,349 @@
+import contextlib
+import ctypes
+import ctypes.util
+import logging
+import os
+import tarfile
+
+import startup
+from poll import PollSource
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+PACMAN_DB = '/var/lib/pacman'
+PACMAN_CONF = '/etc/pacman.conf'
+
+# pacman rewrites the databases file by file, so wait for it to finish
+SETTLE_DELAY = 1.0
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+# Port of pacman's rpmvercmp: compares alternating runs of digits and
+# letters, numbers numerically, and never lets a trailing letter run beat
+# the end of the string (1.0 > 1.0a but 1.0a < 1.0.1)
+
+def _alnum(c):
+    return c.isascii() and c.isalnum()
+
+
+def _alpha(c):
+    return c.isascii() and c.isalpha()
+
+
+def _segment(s, i, digits):
+    test = str.isdigit if digits else str.isalpha
+    start = i
+    while i < len(s) and s[i].isascii() and test(s[i]):
+        i += 1
+    return s[start:i], i
+
+
+def rpmvercmp(a, b):
+    if a == b:
+        return 0
+    one = two = 0
+    while one < len(a) and two < len(b):
+        start1, start2 = one, two
+        while one < len(a) and not _alnum(a[one]):
+            one += 1
+        while two < len(b) and not _alnum(b[two]):
+            two += 1
+        if one == len(a) or two == len(b):
+            break
+        if one - start1 != two - start2:
+            return -1 if one - start1 < two - start2 else 1
+        digits = a[one].isdigit()
+        seg1, one = _segment(a, one, digits)
+        seg2, two = _segment(b, two, digits)
+        if not seg2:
+            return 1 if digits else -1
+        if digits:
+            seg1 = seg1.lstrip('0')
+            seg2 = seg2.lstrip('0')
+            if len(seg1) != len(seg2):
+                return 1 if len(seg1) > len(seg2) else -1
+        if seg1 != seg2:
+            return 1 if seg1 > seg2 else -1
+    if one == len(a) and two == len(b):
+        return 0
+    if (one == len(a) and not _alpha(b[two])) or (one < len(a) and _alpha(a[one])):
+        return -1
+    return 1
+
+
+def _split_evr(evr):
+    epoch, colon, rest = evr.partition(':')
+    if not colon or not (epoch.isdigit() or not epoch):
+        epoch, rest = '0', evr
+    epoch = epoch or '0'
+    version, dash, release = rest.rpartition('-')
+    if not dash:
+        return epoch, rest, None
+    return epoch, version, release
+
+
+# Same as pacman's vercmp: epoch, then version, then release if both have one
+
+def vercmp(a, b):
+    if a == b:
+        return 0
+    epoch1, version1, release1 = _split_evr(a)
+    epoch2, version2, release2 = _split_evr(b)
+    result = rpmvercmp(epoch1, epoch2) or rpmvercmp(version1, version2)
+    if result == 0 and release1 and release2:
+        result = rpmvercmp(release1, release2)
+    return result
+
+
+# Package entries are named <name>-<pkgver>-<pkgrel>, in the local database
+# as directories and in sync databases as tar members
+
+def _split_entry(entry):
+    name, version, release = entry.rsplit('-', 2)
+    return name, version + '-' + release
+
+
+def read_local(path):
+    packages = {}
+    for entry in os.listdir(path):
+        if entry.count('-') >= 2:
+            name, version = _split_entry(entry)
+            packages[name] = version
+    return packages
+
+
+# tarfile handles gzip, bzip2 and xz itself; zstd compressed databases go
+# through python-zstandard
+
+@contextlib.contextmanager
+def _open_db(path):
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+        f.seek(0)
+        if magic != ZSTD_MAGIC:
+            with tarfile.open(fileobj=f, mode='r|*') as db:
+                yield db
+            return
+        if zstandard is None:
+            raise OSError("%s is zstd compressed, install python-zstandard" % path)
+        with zstandard.ZstdDecompressor().stream_reader(f) as stream, \
+                tarfile.open(fileobj=stream, mode='r|') as db:
+            yield db
+
+
+# Only the member names are needed, so the desc files are never parsed
+
+def read_sync(path):
+    packages = {}
+    with _open_db(path) as db:
+        for member in db:
+            entry = member.name.split('/', 1)[0]
+            if entry.count('-') >= 2:
+                name, version = _split_entry(entry)
+                packages[name] = version
+    return packages
+
+
+# Repositories in the order pacman.conf lists them, which is the order
+# pacman picks a package from when several repositories have it
+
+def repositories(conf=PACMAN_CONF, sync=os.path.join(PACMAN_DB, 'sync')):
+    try:
+        available = {name[:-3] for name in os.listdir(sync) if name.endswith('.db')}
+    except OSError:
+        return []
+    order = []
+    try:
+        with open(conf) as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('[') and line.endswith(']') and line[1:-1] in available:
+                    order.append(line[1:-1])
+    except OSError:
+        pass
+    return order + sorted(available - set(order))
+
+
+# Packages with a newer version in the sync databases, like `pacman -Qu`.
+# Every database is parsed once per modification: the parsed tables are
+# kept here and on disk (startup.cached), keyed by the database's mtime.
+
+class UpdateIndex:
+
+    def __init__(self, root=PACMAN_DB, conf=PACMAN_CONF):
+        self.root = root
+        self.conf = conf
+        self.parses = 0
+        self._tables = {}
+
+    def _table(self, path, read):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return {}
+        cached = self._tables.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        def parse():
+            self.parses += 1
+            return read(path)
+        name = 'pacman' + path.replace(os.sep, '-')
+        try:
+            table = startup.cached(name, parse, path)
+        except (OSError, tarfile.TarError, EOFError) as e:
+            logger.warning("can't read %s: %s", path, e)
+            table = {}
+        self._tables[path] = (mtime, table)
+        return table
+
+    def pending(self):
+        sync = os.path.join(self.root, 'sync')
+        installed = self._table(os.path.join(self.root, 'local'), read_local)
+        latest = {}
+        for repo in reversed(repositories(self.conf, sync)):
+            latest.update(self._table(os.path.join(sync, repo + '.db'), read_sync))
+        updates = []
+        for name, version in sorted(installed.items()):
+            new = latest.get(name)
+            if new is not None and vercmp(new, version) > 0:
+                updates.append((name, version, new))
+        return updates
+
+    # Whether pacman.conf or any database was written after timestamp
+
+    def changed_since(self, timestamp):
+        sync = os.path.join(self.root, 'sync')
+        paths = [self.conf, sync, os.path.join(self.root, 'local')]
+        try:
+            paths += [os.path.join(sync, name) for name in os.listdir(sync)]
+        except OSError:
+            pass
+        for path in paths:
+            try:
+                if os.stat(path).st_mtime > timestamp:
+                    return True
+            except OSError:
+                pass
+        return False
+
+
+def _inotify():
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    return libc, fd
+
+
+# Pending update count from the pacman databases, recounted only when
+# inotify reports that a database changed (a sync, install or removal).
+# Parsing a sync database takes seconds, so the count is made in a worker
+# thread and published back on the event loop; changes that come in while
+# it runs make it count once more. Packages from the AUR are not in the
+# sync databases and not counted. The count restored after a restart is
+# kept as long as no database changed since it was made.
+
+class PacmanUpdates(PollSource):
+
+    def __init__(self, format=None, root=PACMAN_DB, conf=PACMAN_CONF):
+        PollSource.__init__(self, timeout=None)
+        self.format = format
+        self.index = UpdateIndex(root, conf)
+        self.root = root
+        self._fd = None
+        self._pending = None
+
+    def start(self):
+        try:
+            libc, self._fd = _inotify()
+            for directory, mask in [
+                    ('sync', IN_CLOSE_WRITE | IN_MOVED_TO),
+                    ('local', IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO)]:
+                path = os.path.join(self.root, directory).encode()
+                if libc.inotify_add_watch(self._fd, path, mask) < 0:
+                    raise OSError(ctypes.get_errno(), "can't watch %s" % path.decode())
+            self.loop.add_reader(self._fd, self._on_inotify)
+        except (AttributeError, OSError) as e:
+            logger.warning("not watching pacman databases: %s", e)
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        PollSource.start(self)
+
+    def stop(self):
+        PollSource.stop(self)
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+    def _on_inotify(self):
+        while True:
+            try:
+                if not os.read(self._fd, 4096):
+                    break
+            except OSError:
+                break
+        if self._pending is not None:
+            self._pending.cancel()
+        self._pending = self.loop.call_later(SETTLE_DELAY, self._settled)
+
+    def _settled(self):
+        self._pending = None
+        self.refresh()
+
+    def fresh(self):
+        return self.updated is not None and not self.index.changed_since(self.updated)
+
+    async def poll(self):
+        count = len(await self.loop.run_in_executor(None, self.index.pending))
+        return self.format(count) if self.format else count
+
+
+# Check the result against pacman:  python3 updates.py [--compare]
+
+def main():
+    import subprocess
+    import sys
+    import time
+
+    index = UpdateIndex()
+    start = time.perf_counter()
+    updates = index.pending()
+    took = time.perf_counter() - start
+    for name, old, new in updates:
+        print(name, old, '->', new)
+    print("%d updates in %.1f ms (%d databases parsed)" % (len(updates), took * 1000, index.parses))
+
+    if '--compare' in sys.argv[1:]:
+        out = subprocess.run(['pacman', '-Qu'], stdout=subprocess.PIPE, text=True).stdout
+        expected = {line.split()[0] for line in out.splitlines() if line.strip()}
+        found = {name for name, _, _ in updates}
+        for name in sorted(expected - found):
+            print("missing:", name)
+        for name in sorted(found - expected):
+            print("extra:", name)
+        print("matches pacman -Qu" if expected == found else "differs from pacman -Qu")
+        sys.exit(expected != found)
+
+
+if __name__ == '__main__':
+    main()
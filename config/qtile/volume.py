@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import os
+
+import notify
+import poll
+from source import Source
+
+try:
+    import pulsectl_asyncio
+except (ImportError, OSError):  # OSError: installed, but libpulse isn't
+    pulsectl_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+DUNST_ICONS = os.path.expanduser('~/.local/share/icons/Dunst-Icons/')
+RECONNECT_DELAY = 2
+
+# (lowest percent, bar glyph, notification icon)
+LEVELS = [
+    (67, " ", "volume-high.svg"),
+    (34, "墳 ", "volume-medium.svg"),
+    (0,  " ", "volume-low.svg"),
+]
+MUTED = ("婢 ", "volume-muted.svg")
+
+
+def level(percent, muted):
+    if muted:
+        return MUTED
+    return next(entry for entry in LEVELS if percent >= entry[0])[1:]
+
+
+# Volume of the default sink over one long-lived connection to the
+# PulseAudio/PipeWire server. Changes are computed from the cached state and
+# sent without reading the volume back first, and the bar is updated from the
+# server's sink change events. Without pulsectl_asyncio it falls back to a
+# single pamixer call per change.
+
+class Volume(Source):
+
+    def __init__(self, step=5, limit=150, server=None):
+        Source.__init__(self)
+        self.step = step
+        self.limit = limit
+        self.server = server
+        self.volume = None
+        self.muted = False
+        self._pulse = None
+        self._sink = None
+        self._task = None
+
+    def start(self):
+        if pulsectl_asyncio is not None:
+            self._task = self.loop.create_task(self._run())
+        else:
+            self.refresh()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                async with pulsectl_asyncio.PulseAsync('qtile-volume', server=self.server) as pulse:
+                    self._pulse = pulse
+                    await self._update()
+                    async for _ in pulse.subscribe_events('sink', 'server'):
+                        await self._update()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("lost connection to the sound server: %s", e)
+            self._pulse = None
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _update(self):
+        info = await self._pulse.server_info()
+        self._sink = await self._pulse.get_sink_by_name(info.default_sink_name)
+        self._show(round(self._sink.volume.value_flat * 100), bool(self._sink.mute))
+
+    def _show(self, volume, muted):
+        self.volume = volume
+        self.muted = muted
+        self.publish(level(volume, muted)[0] + str(volume) + "%")
+
+    def refresh(self):
+        if pulsectl_asyncio is None:
+            self.loop.create_task(self._pamixer())
+
+    async def _pamixer(self, *args):
+        try:
+            if args:
+                await poll.run(['pamixer', *args])
+            out = await poll.run(['pamixer', '--get-volume', '--get-mute'], returncodes=(0, 1))
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning("pamixer failed: %r", e)
+            return False
+        fields = out.split()
+        volume = next((int(f) for f in fields if f.isdigit()), 0)
+        self._show(volume, 'true' in fields)
+        return True
+
+    # Raise or lower by delta percent, unmuting on the way like changevolume
+
+    def change(self, delta):
+        if self.volume is None:
+            return
+        volume = self.volume + delta
+        volume = max(volume, 0)
+        if delta > 0:
+            volume = min(volume, max(self.limit, self.volume))
+        # Track the requested state right away so quick presses add up
+        self.volume, self.muted = volume, False
+        self.loop.create_task(self._set(volume, False))
+
+    def up(self):
+        self.change(self.step)
+
+    def down(self):
+        self.change(-self.step)
+
+    def toggle_mute(self):
+        if self.volume is None:
+            return
+        self.muted = not self.muted
+        self.loop.create_task(self._set(self.volume, self.muted))
+
+    async def _set(self, volume, muted):
+        if self._pulse is not None and self._sink is not None:
+            try:
+                # Both requests go out before either reply is awaited
+                await asyncio.gather(
+                    self._pulse.volume_set_all_chans(self._sink, volume / 100),
+                    self._pulse.mute(self._sink, muted))
+            except Exception as e:
+                logger.warning("can't set volume: %s", e)
+                return
+            self._show(volume, muted)
+        elif pulsectl_asyncio is None:
+            action = ['--mute'] if muted else ['--unmute', '--allow-boost', '--set-volume', str(volume)]
+            if not await self._pamixer(*action):
+                return
+        else:
+            return
+        self.notify()
+
+    def notify(self):
+        icon = DUNST_ICONS + level(self.volume, self.muted)[1]
+        message = "Muted" if self.muted else "Volume: %d%%" % self.volume
+        notify.send(message, app_name="changevolume", icon=icon, replaces_id=9993,
+                    urgency='low', timeout=2000, value=self.volume)
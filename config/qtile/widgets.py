@@ -0,0 +1,55 @@
+from libqtile import widget
+from libqtile.widget import base
+
+
+# Text widget that shows whatever its source publishes
+
+class SourceText(base._TextBox):
+
+    def __init__(self, source, **config):
+        base._TextBox.__init__(self, "", **config)
+        self.source = source
+
+    def _configure(self, qtile, bar):
+        # Reconfiguring a bar configures its widgets again
+        configured = self.configured
+        base._TextBox._configure(self, qtile, bar)
+        if not configured:
+            self.source.subscribe(self.update)
+
+    def update(self, text):
+        if text is None or self.text == text:
+            return
+        old_width = self.layout.width
+        self.text = text
+        if self.layout.width == old_width:
+            self.draw()
+        else:
+            self.bar.draw()
+
+    def finalize(self):
+        self.source.unsubscribe(self.update)
+        base._TextBox.finalize(self)
+
+
+# WidgetBox whose contents are only created the first time it is opened,
+# so a closed systray box costs nothing at startup
+
+class LazyWidgetBox(widget.WidgetBox):
+
+    def __init__(self, make_widgets, **config):
+        widget.WidgetBox.__init__(self, widgets=[], **config)
+        self.make_widgets = make_widgets
+
+    def cmd_toggle(self):
+        if self.make_widgets is not None:
+            self.widgets = self.make_widgets()
+            self.make_widgets = None
+            for w in self.widgets:
+                self.qtile.register_widget(w)
+                w._configure(self.qtile, self.bar)
+                w.configured = True
+                w.offsety = self.bar.border_width[0]
+                w.offsetx = self.bar.width
+                self.qtile.call_soon(w.draw)
+        widget.WidgetBox.cmd_toggle(self)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+import poll
+from timer import wheel
+
+CACHE_PATH = os.path.join(os.environ.get('XDG_RUNTIME_DIR', '/tmp'), 'qtile-wifi.json')
+
+# Seconds between reads of NetworkManager's scan results (it scans on its
+# own): short after a link change or when the menu was opened, doubling up
+# to the maximum while the results stay the same, and at most
+# DISCONNECTED_MAX without a connection. Saved connections are read every
+# SAVED_INTERVAL.
+MIN_INTERVAL = 15
+MAX_INTERVAL = 300
+DISCONNECTED_MAX = 60
+SAVED_INTERVAL = 300
+
+LOCKED = ""
+OPEN = ""
+
+_FIELD = re.compile(r'(?<!\\):')
+
+
+def _fields(line):
+    return [field.replace('\\:', ':').replace('\\\\', '\\') for field in _FIELD.split(line)]
+
+
+# `nmcli -t -f IN-USE,SIGNAL,SECURITY,SSID device wifi list` to a list of
+# (ssid, security, signal, in use), one per SSID (its strongest access
+# point), in use first and then by signal. Hidden networks are left out.
+
+def parse_scan(out):
+    networks = {}
+    for line in out.splitlines():
+        fields = _fields(line)
+        if len(fields) != 4 or not fields[3]:
+            continue
+        in_use, signal, security, ssid = fields
+        network = (ssid, security, int(signal) if signal.isdigit() else 0, in_use == '*')
+        old = networks.get(ssid)
+        if old is None or (network[3], network[2]) > (old[3], old[2]):
+            networks[ssid] = network
+    return sorted(networks.values(), key=lambda n: (not n[3], -n[2], n[0]))
+
+
+# A menu entry: a lock for secured networks, then two spaces and the SSID
+# (wifi-menu.sh cuts the first three characters off to get the SSID back)
+
+def entry(network):
+    ssid, security, _, _ = network
+    return (LOCKED if security and security != '--' else OPEN) + "  " + ssid
+
+
+def load(path=CACHE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save(state, path=CACHE_PATH):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+# Keeps the Wi-Fi scan results, the saved connections and the radio state
+# in memory and in a cache file, so the rofi menu can be served from it
+# without waiting for nmcli. The results NetworkManager already has are
+# read on the shared timer wheel, re-registered whenever the interval
+# backs off or is reset, and when the link changes; a new radio scan is
+# only asked for when the menu is opened (see main).
+
+class WifiScanner:
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.state = load(path) or {'radio': None, 'networks': [], 'saved': [], 'scanned': 0}
+        self.interval = MIN_INTERVAL
+        self.refreshes = 0
+        self._saved_at = 0
+        self._started = False
+        self._task = None
+
+    @property
+    def loop(self):
+        return asyncio.get_event_loop()
+
+    def start(self):
+        self._started = True
+        self.refresh()
+        wheel.add(self.interval, self.refresh)
+
+    def stop(self):
+        self._started = False
+        wheel.remove(self.refresh)
+
+    def _set_interval(self, interval):
+        if interval == self.interval:
+            return
+        self.interval = interval
+        if self._started:
+            wheel.remove(self.refresh)
+            wheel.add(interval, self.refresh)
+
+    def refresh(self):
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._update())
+
+    # Connected or disconnected, the list and saved connections are about
+    # to look different
+
+    def link_changed(self, _value=None):
+        self._saved_at = 0
+        self._set_interval(MIN_INTERVAL)
+        self.refresh()
+
+    # Opening the menu starts a radio scan, pick its results up soon
+
+    def menu_opened(self):
+        self._set_interval(MIN_INTERVAL)
+
+    async def _nmcli(self, *args):
+        try:
+            return await poll.run(('nmcli',) + args, timeout=10)
+        except (OSError, asyncio.TimeoutError):
+            return None
+
+    async def _update(self):
+        state = dict(self.state)
+        interval = self.interval
+        radio = await self._nmcli('-t', '-f', 'WIFI', 'general')
+        if radio is not None:
+            state['radio'] = radio.strip()
+        if state['radio'] == 'enabled':
+            out = await self._nmcli(
+                '-t', '-f', 'IN-USE,SIGNAL,SECURITY,SSID', 'device', 'wifi', 'list', '--rescan', 'no')
+            if out is not None:
+                networks = [list(n) for n in parse_scan(out)]
+                if networks != state['networks']:
+                    interval = MIN_INTERVAL
+                else:
+                    interval = min(self.interval * 2, MAX_INTERVAL)
+                state['networks'] = networks
+                state['scanned'] = time.time()
+        else:
+            state['networks'] = []
+            interval = MAX_INTERVAL
+        if not any(network[3] for network in state['networks']):
+            interval = min(interval, DISCONNECTED_MAX)
+        self._set_interval(interval)
+
+        if time.time() - self._saved_at > SAVED_INTERVAL:
+            out = await self._nmcli('-t', '-f', 'NAME', 'connection')
+            if out is not None:
+                state['saved'] = sorted(_fields(line)[0] for line in out.splitlines() if line)
+                self._saved_at = time.time()
+
+        self.refreshes += 1
+        if state != self.state:
+            self.state = state
+            try:
+                await self.loop.run_in_executor(None, save, state, self.path)
+            except OSError:
+                pass
+
+
+# For wifi-menu.sh:
+#   wifi.py menu            radio state, then one menu entry per network;
+#                           also starts a radio scan for qtile to pick up
+#   wifi.py saved <name>    exit status 0 if there's a saved connection
+#   wifi.py rescan          scan now (blocking) and update the cache
+# Without a cache (qtile not running) nmcli is asked directly.
+
+def _run(*args):
+    return subprocess.run(('nmcli',) + args, stdout=subprocess.PIPE, text=True).stdout
+
+
+def rescan(path=CACHE_PATH):
+    state = load(path) or {}
+    state['radio'] = _run('-t', '-f', 'WIFI', 'general').strip()
+    out = _run('-t', '-f', 'IN-USE,SIGNAL,SECURITY,SSID', 'device', 'wifi', 'list', '--rescan', 'yes')
+    state['networks'] = [list(n) for n in parse_scan(out)]
+    state['saved'] = sorted(_fields(line)[0] for line in
+                            _run('-t', '-f', 'NAME', 'connection').splitlines() if line)
+    state['scanned'] = time.time()
+    try:
+        save(state, path)
+    except OSError:
+        pass
+    return state
+
+
+def main():
+    args = sys.argv[1:]
+    command = args[0] if args else 'menu'
+    if command == 'rescan':
+        rescan()
+        return
+    state = load()
+    if state is None:
+        state = rescan()
+    elif command == 'menu' and state['radio'] == 'enabled':
+        subprocess.Popen(['nmcli', 'device', 'wifi', 'rescan'], stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+    if command == 'menu':
+        print(state['radio'])
+        for network in state['networks']:
+            print(entry(network))
+    elif command == 'saved' and len(args) == 2:
+        sys.exit(0 if args[1] in state['saved'] else 1)
+    else:
+        sys.exit("usage: wifi.py menu|saved <name>|rescan")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env bash
 
 dir="/home/roshi/.config/rofi"
+resolver="$HOME/.config/qtile/resolver.py"
 rofi_command="rofi -theme $dir/network.rasi"
 
 ## Get info
@@ -13,7 +14,8 @@ STATUS="$(nmcli radio wifi)"
 active=""
 urgent=""
 
-if (ping -c 1 archlinux.org || ping -c 1 google.com || ping -c 1 bitbucket.org || ping -c 1 github.com || ping -c 1 sourceforge.net) &>/dev/null; then
+# Probes run in parallel and are cached, see ~/.config/qtile/resolver.py
+if python3 "$resolver" online; then
 	if [[ $STATUS == *"enable"* ]]; then
         if [[ $IFACE == e* ]]; then
             connected=""
@@ -22,7 +24,7 @@ if (ping -c 1 archlinux.org || ping -c 1 google.com || ping -c 1 bitbucket.org |
         fi
 	active="-a 0"
 	SSID=" $(nmcli connection show --active | grep 'wifi' | awk '{ print $1 }' FS='  ')"
-	PIP="$(wget --timeout=30 http://ipinfo.io/ip -qO -)"
+	PIP="$(python3 "$resolver" wan)"
 	fi
 else
     urgent="-u 0"
@@ -3,11 +3,13 @@
 theme="wifi-menu"
 dir="/home/roshi/.config/rofi"
 
-notify-send "Getting list of available Wi-Fi networks..." -t 2000
-# Get a list of available wifi connections and morph it into a nice-looking list
-wifi_list=$(nmcli --fields "SECURITY,SSID" device wifi list | sed 1d | sed 's/  */ /g' | sed -E "s/WPA*.?\S/ /g" | sed "s/^--/ /g" | sed "s/  //g" | sed "/--/d")
+wifi="$HOME/.config/qtile/wifi.py"
+rescan="  Rescan"
 
-connected=$(nmcli -fields WIFI g)
+# Radio state and the networks, from the list qtile keeps fresh in the
+# background (see ~/.config/qtile/wifi.py), so the menu opens at once.
+# Opening it also starts a scan, which qtile picks up for the next time.
+{ read -r connected; wifi_list=$(cat); } < <(python3 "$wifi" menu)
 if [[ "$connected" =~ "enabled" ]]; then
 	toggle="睊  Disable Wi-Fi"
 elif [[ "$connected" =~ "disabled" ]]; then
@@ -15,7 +17,10 @@ elif [[ "$connected" =~ "disabled" ]]; then
 fi
 
 # Use rofi to select wifi network
-chosen_network=$(echo -e "$toggle\n$wifi_list" | uniq -u | rofi -dmenu -selected-row 1 -p "Wi-Fi SSID: " -theme $dir/"$theme")
+options="$toggle"
+[ -n "$wifi_list" ] && options+="\n$wifi_list"
+options+="\n$rescan"
+chosen_network=$(echo -e "$options" | rofi -dmenu -selected-row 1 -p "Wi-Fi SSID: " -theme $dir/"$theme")
 # Get name of connection
 chosen_id=$(echo "${chosen_network:3}" | xargs)
 
@@ -25,12 +30,15 @@ elif [ "$chosen_network" = "直  Enable Wi-Fi" ]; then
 	nmcli radio wifi on
 elif [ "$chosen_network" = "睊  Disable Wi-Fi" ]; then
 	nmcli radio wifi off
+elif [ "$chosen_network" = "$rescan" ]; then
+	notify-send "Getting list of available Wi-Fi networks..." -t 2000
+	python3 "$wifi" rescan
+	exec "$0"
 else
 	# Message to show when connection is activated successfully
 	success_message="You are now connected to the Wi-Fi network \"$chosen_id\"."
-	# Get saved connections
-	saved_connections=$(nmcli -g NAME connection)
-	if [[ $(echo "$saved_connections" | grep -w "$chosen_id") = "$chosen_id" ]]; then
+	# Saved connections are brought up, new ones need a password
+	if python3 "$wifi" saved "$chosen_id"; then
 		nmcli connection up id "$chosen_id" | grep "successfully" && notify-send "Connection Established" "$success_message"
 	else
 		if [[ "$chosen_network" =~ "" ]]; then
@@ -2,7 +2,22 @@
 
 import psutil
 import argparse
+import os
 import subprocess
+import sys
+
+
+# Time left at the discharge rate qtile's battery telemetry has averaged,
+# if it is running; psutil's instantaneous figure otherwise
+
+def smoothed_secsleft(battery):
+    sys.path.insert(0, os.path.expanduser('~/.config/qtile'))
+    try:
+        from telemetry import Telemetry
+        telemetry = Telemetry(readonly=True)
+        return telemetry.estimate(telemetry.latest()[1]) or battery.secsleft
+    except (ImportError, OSError, ValueError, TypeError):
+        return battery.secsleft
 
 
 def secs2hours(secs):
@@ -23,7 +38,7 @@ args = parser.parse_args()
 battery = psutil.sensors_battery()
 icon = ""
 percent = int(battery.percent)
-time_left = battery.secsleft
+time_left = smoothed_secsleft(battery) if not battery.power_plugged else battery.secsleft
 isPlugged = battery.power_plugged
 remaining = secs2hours(time_left)
 
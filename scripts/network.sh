@@ -1,6 +1,6 @@
 #!/bin/bash
 
-# This script requires dnsutils aka bind to fetch the WAN IP address
+# The WAN IP address comes from the qtile config's cached resolver
 
 # Shows the connections names
 # nmcli connection show --active | grep 'ethernet' | awk '{ print $1 }' FS='  '
@@ -18,13 +18,13 @@ function ShowInfo() {
     connection="\
 SSID:	$(nmcli connection show --active | grep 'ethernet' | awk '{ print $1 }' FS='  ') 
 IP:   $(nmcli -t -f IP4.ADDRESS dev show $(nmcli connection show --active | grep 'ethernet' | awk '{ print $6 }' FS=' ') | awk '{print $2}' FS='[:/]')
-WAN: 	$(dig +short myip.opendns.com @resolver1.opendns.com)"
+WAN: 	$(python3 ~/.config/qtile/resolver.py wan)"
   
   elif [ "$(nmcli connection show --active | grep -oh "\w*wifi\w*")" == "wifi" ]; then
     connection="\
 SSID: $(nmcli connection show --active | grep 'wifi' | awk '{ print $1 }' FS='  ') 
 IP:   $(ip -brief address | grep UP | sed -r 's/[ ]+/ /g' | cut -d ' ' -f 3) 
-WAN:  $(dig +short myip.opendns.com @resolver1.opendns.com)"
+WAN:  $(python3 ~/.config/qtile/resolver.py wan)"
   
   else
     connection="No active connection."
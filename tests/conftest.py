@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The config modules import each other by plain name, as qtile puts
+# config/qtile on sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'config', 'qtile'))
@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import backlight
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(backlight.notify, 'send', lambda *a, **k: None)
+    root = tmp_path / 'backlight'
+    for name, actual in [('acpi_video0', 10), ('intel_backlight', 9600)]:
+        device = root / name
+        device.mkdir(parents=True)
+        (device / 'max_brightness').write_text('19200\n')
+        (device / 'actual_brightness').write_text('%d\n' % actual)
+        (device / 'brightness').write_text('%d\n' % actual)
+    return root
+
+
+def written(root):
+    return int((root / 'intel_backlight' / 'brightness').read_text())
+
+
+def test_prefers_the_panel_driver(root):
+    assert backlight.Backlight(str(root), logind=False).device == 'intel_backlight'
+
+
+def test_steps_through_sysfs(root):
+    light = backlight.Backlight(str(root), logind=False)
+    shown = []
+    light._subscribers.append(shown.append)
+    light.up()
+    assert written(root) == 10560
+    assert shown[-1].endswith('55%')
+    light.down()
+    light.down()
+    assert written(root) == 8640
+
+
+def test_never_blanks_the_panel(root):
+    (root / 'intel_backlight' / 'actual_brightness').write_text('500\n')
+    light = backlight.Backlight(str(root), logind=False)
+    light.change(-10)
+    assert written(root) == 1
+    light.change(200)
+    assert written(root) == 19200
+
+
+def test_unreadable_brightness_is_ignored(root):
+    (root / 'intel_backlight' / 'actual_brightness').unlink()
+    light = backlight.Backlight(str(root), logind=False)
+    light.up()
+    assert light.current is None
+    assert written(root) == 9600
+
+
+def test_smooth_steps_end_on_the_target(root):
+    async def main():
+        light = backlight.Backlight(str(root), logind=False, smooth=4, smooth_interval=0.001)
+        light.up()
+        light.up()  # during the first: adds to where it was going
+        await asyncio.sleep(0.05)
+        assert written(root) == 11520
+    asyncio.run(main())
+
+
+# logind over a fake system bus
+
+dbus_next = pytest.importorskip('dbus_next')
+
+
+class FakeBus:
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def __call__(self, bus_type=None):
+        return self
+
+    async def connect(self):
+        return self
+
+    async def call(self, message):
+        self.calls.append(message.body)
+        if self.error:
+            return SimpleNamespace(message_type=dbus_next.MessageType.ERROR,
+                                   error_name=self.error, body=["refused"])
+        return SimpleNamespace(message_type=dbus_next.MessageType.METHOD_RETURN)
+
+
+def run_steps(root, monkeypatch, bus, steps):
+    monkeypatch.setattr(backlight, 'MessageBus', bus)
+    light = backlight.Backlight(str(root))
+
+    async def main():
+        for step in steps:
+            light.change(step)
+        await asyncio.sleep(0.01)
+    asyncio.run(main())
+    return light
+
+
+def test_logind_sets_brightness(root, monkeypatch):
+    bus = FakeBus()
+    light = run_steps(root, monkeypatch, bus, [5])
+    assert bus.calls == [['backlight', 'intel_backlight', 10560]]
+    assert written(root) == 9600 and light.logind
+
+
+def test_logind_error_falls_back_to_the_latest_target(root, monkeypatch):
+    bus = FakeBus('org.freedesktop.login1.NoSessionForPID')
+    light = run_steps(root, monkeypatch, bus, [5, 5])
+    assert len(bus.calls) == 2
+    assert written(root) == 11520
+    # worth trying again next time
+    assert light.logind
+
+
+def test_logind_access_denied_stops_asking(root, monkeypatch):
+    bus = FakeBus('org.freedesktop.DBus.Error.AccessDenied')
+    light = run_steps(root, monkeypatch, bus, [5])
+    assert written(root) == 10560 and not light.logind
+    light.up()
+    assert len(bus.calls) == 1 and written(root) == 11520
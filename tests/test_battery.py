@@ -0,0 +1,106 @@
+import math
+
+import pytest
+
+import battery
+import telemetry
+from telemetry import Telemetry
+
+
+def supply(root, name, **files):
+    path = root / name
+    path.mkdir(parents=True)
+    for key, value in files.items():
+        (path / key).write_text('%s\n' % value)
+
+
+@pytest.fixture
+def root(tmp_path):
+    return tmp_path / 'power_supply'
+
+
+def test_discharging(root):
+    supply(root, 'AC', type='Mains', online=0)
+    supply(root, 'BAT0', type='Battery', status='Discharging', capacity=57,
+           energy_now=28500000, energy_full=50000000, power_now=9500000)
+    state = battery.read_battery(str(root))
+    assert state == {'percent': 57, 'secsleft': 3 * 3600, 'plugged': False,
+                     'energy': 28500000, 'power': 9500000}
+
+
+def test_charging(root):
+    supply(root, 'AC', type='Mains', online=1)
+    supply(root, 'BAT0', type='Battery', status='Charging', capacity=42,
+           energy_now=21000000, energy_full=50000000, power_now=20000000)
+    state = battery.read_battery(str(root))
+    assert state['plugged'] and state['secsleft'] is None
+    assert battery.icon(state['percent'], state['plugged']) == battery.CHARGING_ICONS[4]
+
+
+def test_full_without_mains_supply(root):
+    supply(root, 'BAT1', type='Battery', status='Full', capacity=100,
+           energy_now=50000000, energy_full=50000000, power_now=0)
+    state = battery.read_battery(str(root))
+    assert state['plugged'] and state['percent'] == 100
+    assert battery.icon(100, True) == battery.CHARGING_ICONS[10]
+
+
+# Batteries that only report charge, and no capacity file: the percentage
+# comes from charge_now / charge_full
+
+def test_charge_instead_of_energy(root):
+    supply(root, 'BAT0', type='Battery', status='Discharging',
+           charge_now=1500000, charge_full=4000000, current_now=1000000)
+    state = battery.read_battery(str(root))
+    assert state['percent'] == 37
+    assert state['secsleft'] == int(1.5 * 3600)
+    assert state['energy'] == 1500000
+
+
+def test_no_battery(root):
+    supply(root, 'AC', type='Mains', online=1)
+    assert battery.read_battery(str(root)) is None
+    assert battery.read_battery(str(root / 'missing')) is None
+
+
+def test_provider_status(root, tmp_path, monkeypatch):
+    monkeypatch.setattr(battery, 'Telemetry', lambda: Telemetry(str(tmp_path / 'ring')))
+    supply(root, 'BAT0', type='Battery', status='Discharging', capacity=57,
+           energy_now=28500000, energy_full=50000000, power_now=9500000)
+    provider = battery.BatteryProvider(str(root))
+    shown = []
+    provider._subscribers.append(shown.append)
+    provider.refresh()
+    assert shown == [battery.DISCHARGING_ICONS[5] + " 57% 3:00"]
+    provider.stop()
+
+
+def test_ring_wraps_around(tmp_path):
+    ring = Telemetry(str(tmp_path / 'ring'), capacity=4)
+    for i in range(6):
+        ring.add(1000 + i, 100 - i, None, False)
+    assert [sample[0] for sample in ring.samples()] == [1002, 1003, 1004, 1005]
+    assert ring.latest() == (1005, 95, None)
+    ring.close()
+
+    # the ring and its position survive reopening
+    ring = Telemetry(str(tmp_path / 'ring'), capacity=4)
+    assert ring.latest() == (1005, 95, None)
+    ring.close()
+
+
+def test_ewma_rate(tmp_path):
+    ring = Telemetry(str(tmp_path / 'ring'), tau=300)
+    ring.add(0, 50000000, 10000000, True)
+    assert ring.rate == 10000000
+    ring.add(300, 49000000, 20000000, True)
+    # a reading one time constant later gets 1 - 1/e of the weight
+    assert ring.rate == pytest.approx(10000000 + (1 - math.exp(-1)) * 10000000)
+    # charging readings and readings out of order don't move the average
+    rate = ring.rate
+    ring.add(600, 49000000, 30000000, False)
+    ring.add(100, 49000000, 30000000, True)
+    assert ring.rate == rate
+    assert ring.estimate(36000000) == int(36000000 * 3600 / rate)
+    assert telemetry.Telemetry(str(tmp_path / 'ring'), readonly=True).rate == rate
+    ring.close()
@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip('libqtile')
+
+from libqtile import widget  # noqa: E402
+
+import damage  # noqa: E402
+
+
+class FakeDrawer:
+
+    def __init__(self):
+        self.draws = 0
+
+    def clear(self, colour):
+        pass
+
+    def draw(self, **kwargs):
+        self.draws += 1
+
+
+# A horizontal DamageBar laid out and drawn without an X server: the bar
+# and its widgets paint to drawers that only count, and each widget counts
+# the times its own draw() runs
+
+def make_bar(*widgets, length=300):
+    b = damage.DamageBar(list(widgets), 24)
+    b.horizontal = True
+    b.length = length
+    b.drawer = FakeDrawer()
+    for w in widgets:
+        w.bar = b
+        w.drawer = FakeDrawer()
+        w.offsety = 0
+        w.drawn = 0
+        w.draw = counted(w)
+    return b
+
+
+def counted(w):
+    draw = w.draw
+
+    def count():
+        w.drawn += 1
+        draw()
+    return count
+
+
+def test_unchanged_widgets_are_not_redrawn():
+    left, right = widget.Spacer(40), widget.Spacer(60)
+    b = make_bar(left, right)
+    b._actual_draw()
+    assert (left.drawn, right.drawn) == (1, 1)
+
+    # _actual_draw lays the bar out again every time
+    b._actual_draw()
+    b._actual_draw()
+    assert (left.drawn, right.drawn) == (1, 1)
+
+
+def test_moved_widgets_are_copied():
+    left, right = widget.Spacer(40), widget.Spacer(60)
+    b = make_bar(left, right)
+    b._actual_draw()
+    copies = right.drawer.draws
+
+    left.length = 50
+    b._actual_draw()
+    assert (left.drawn, right.drawn) == (2, 1)
+    assert right.offsetx == 50 and right.drawer.draws == copies + 1
+
+
+def test_new_bar_length_repaints_everything():
+    left, right = widget.Spacer(40), widget.Spacer(60)
+    b = make_bar(left, right)
+    b._actual_draw()
+    b.length = 400
+    b._actual_draw()
+    assert (left.drawn, right.drawn) == (2, 2)
@@ -0,0 +1,80 @@
+import hotplug
+from monitors import Monitor
+
+
+class FakeBar:
+
+    def __init__(self):
+        self.window = object()
+        self.finalized = False
+
+    def kill_window(self):
+        self.window = None
+        self.finalized = True
+
+
+class FakeScreen:
+
+    def __init__(self, index):
+        self.index = index
+        self.top = FakeBar()
+
+
+class FakeQtile:
+
+    # Mirrors libqtile's _process_screens: the first len(monitors) screens
+    # of the config are used, the bars of screens no longer used are killed
+
+    def __init__(self, screens, monitors):
+        self.config = type('Config', (), {'screens': screens})()
+        self.screens = list(screens)
+        self.monitors = monitors
+        self.reconfigured = 0
+
+    def cmd_reconfigure_screens(self):
+        self.reconfigured += 1
+        screens = self.config.screens[:len(self.monitors[0])]
+        for screen in self.screens:
+            if screen not in screens and screen.top.window:
+                screen.top.kill_window()
+        self.screens = screens
+
+
+def monitor(name, x):
+    return Monitor(name, x, 0, 1920, 1080, x == 0)
+
+
+def setup(monkeypatch, outputs):
+    monitors = [outputs]
+    monkeypatch.setattr(hotplug, 'get_monitors', lambda refresh=False: monitors[0])
+    plug = hotplug.Hotplug(FakeScreen, '/nonexistent/screenlayout.sh')
+    plug.apply_layout = lambda qtile: None
+    screens = [FakeScreen(i) for i in range(len(outputs))]
+    return plug, FakeQtile(screens, monitors), monitors
+
+
+def test_unplug_and_replug_builds_a_new_screen(monkeypatch):
+    plug, qtile, monitors = setup(monkeypatch, [monitor('eDP-1', 0), monitor('HDMI-1', 1920)])
+    first, second = qtile.config.screens
+
+    monitors[0] = [monitor('eDP-1', 0)]
+    plug.screen_change(qtile)
+    assert qtile.reconfigured == 1
+    assert qtile.config.screens == [first]
+    assert second.top.finalized and not first.top.finalized
+
+    monitors[0] = [monitor('eDP-1', 0), monitor('HDMI-1', 1920)]
+    plug.screen_change(qtile)
+    assert qtile.reconfigured == 2
+    assert len(qtile.config.screens) == 2
+    assert qtile.config.screens[0] is first
+    assert qtile.config.screens[1] is not second
+    assert qtile.config.screens[1].top.window is not None
+
+
+def test_same_outputs_only_reconfigures(monkeypatch):
+    plug, qtile, monitors = setup(monkeypatch, [monitor('eDP-1', 0)])
+    screens = list(qtile.config.screens)
+    plug.screen_change(qtile)
+    assert qtile.config.screens == screens
+    assert qtile.reconfigured == 1
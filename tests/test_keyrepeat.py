@@ -0,0 +1,161 @@
+import pytest
+
+import keyrepeat
+
+
+# Event loop with a clock the test moves by hand
+
+class FakeLoop:
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+
+    def time(self):
+        return self.now
+
+    def call_later(self, delay, callback):
+        timer = FakeTimer(self.now + delay, callback)
+        self.timers.append(timer)
+        return timer
+
+    def advance(self, seconds):
+        self.now += seconds
+        for timer in sorted(self.timers, key=lambda t: t.when):
+            if timer.when <= self.now and not timer.cancelled:
+                self.timers.remove(timer)
+                timer.callback()
+
+
+class FakeTimer:
+
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    loop = FakeLoop()
+    monkeypatch.setattr(keyrepeat.asyncio, 'get_event_loop', lambda: loop)
+    return loop
+
+
+class Recorder:
+
+    def __init__(self):
+        self.calls = []
+
+    def action(self, name):
+        def apply(*args):
+            self.calls.append((name,) + args)
+        return apply
+
+
+# Auto-repeat at 25 Hz, the X server's default rate
+
+def press(loop, queue, action, amount=None, count=1, interval=0.04):
+    for _ in range(count):
+        queue.push(action, amount)
+        loop.advance(interval)
+
+
+def test_repeats_within_the_window_are_summed(loop):
+    recorder = Recorder()
+    up = recorder.action('up')
+    queue = keyrepeat.ActionQueue()
+    for _ in range(7):
+        queue.push(up, 5)
+        loop.advance(0.01)
+    assert recorder.calls == []
+    loop.advance(keyrepeat.WINDOW)
+    assert recorder.calls == [('up', 35)]
+    assert queue.stats() == {'events': 7, 'applied': 1, 'merged': 6}
+
+
+def test_window_starts_at_the_first_press(loop):
+    recorder = Recorder()
+    up = recorder.action('up')
+    queue = keyrepeat.ActionQueue()
+    # presses 0, 40, 80 and 120 ms: the first two share the first window
+    press(loop, queue, up, 5, count=4)
+    loop.advance(1)
+    assert recorder.calls == [('up', 10), ('up', 10)]
+
+
+def test_only_identical_actions_merge(loop):
+    recorder = Recorder()
+    up, down, mute = recorder.action('up'), recorder.action('down'), recorder.action('mute')
+    queue = keyrepeat.ActionQueue()
+    queue.push(up, 5)
+    queue.push(up, 5)
+    queue.push(mute)
+    queue.push(mute)
+    queue.push(up, 5)
+    queue.push(down, -5)
+    loop.advance(keyrepeat.WINDOW)
+    assert recorder.calls == [('up', 10), ('mute',), ('mute',), ('up', 5), ('down', -5)]
+    assert queue.merged == 1
+
+
+def test_changes_that_cancel_out_are_not_applied(loop):
+    recorder = Recorder()
+    change = recorder.action('change')
+    queue = keyrepeat.ActionQueue()
+    queue.push(change, 5)
+    queue.push(change, -5)
+    loop.advance(keyrepeat.WINDOW)
+    assert recorder.calls == []
+
+
+def test_flush_applies_at_once(loop):
+    recorder = Recorder()
+    up = recorder.action('up')
+    queue = keyrepeat.ActionQueue()
+    queue.push(up, 5)
+    queue.flush()
+    assert recorder.calls == [('up', 5)]
+    assert all(timer.cancelled for timer in loop.timers)
+    loop.advance(1)
+    assert recorder.calls == [('up', 5)]
+
+
+# Through the key bindings in config.py, as qtile fires them
+
+class FakeControl:
+
+    step = 5
+
+    def __init__(self, recorder, name):
+        self.change = recorder.action(name)
+        self.toggle_mute = recorder.action(name + ' mute')
+
+
+def test_config_key_bindings_coalesce(loop, monkeypatch):
+    pytest.importorskip('libqtile')
+    import config
+
+    recorder = Recorder()
+    monkeypatch.setattr(config, 'keyqueue', keyrepeat.ActionQueue())
+    monkeypatch.setattr(config, 'volume', FakeControl(recorder, 'volume'))
+    monkeypatch.setattr(config, 'brightness', FakeControl(recorder, 'brightness'))
+    bindings = {key.key: key.commands[0].args[0] for key in config.keys if not key.modifiers}
+
+    def hold(name, count):
+        for _ in range(count):
+            bindings[name](None)
+            loop.advance(0.01)
+
+    hold('XF86AudioRaiseVolume', 7)
+    hold('XF86MonBrightnessDown', 2)
+    loop.advance(keyrepeat.WINDOW)
+    assert recorder.calls == [('volume', 35), ('brightness', -10)]
+
+    hold('XF86AudioMute', 1)
+    hold('XF86AudioLowerVolume', 3)
+    loop.advance(keyrepeat.WINDOW)
+    assert recorder.calls[2:] == [('volume mute',), ('volume', -15)]
@@ -0,0 +1,108 @@
+import asyncio
+import socket
+
+import pytest
+
+import network
+
+
+def interface(root, name, operstate='up', device=True, wireless=False):
+    path = root / name
+    path.mkdir(parents=True)
+    (path / 'operstate').write_text(operstate + '\n')
+    if device:
+        (path / 'device').mkdir()
+    if wireless:
+        (path / 'wireless').mkdir()
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / 'net'
+    interface(root, 'lo', operstate='unknown', device=False)
+    interface(root, 'docker0', device=False)
+    return root
+
+
+def addresses(table):
+    return lambda iface: table.get(iface)
+
+
+def test_wired_wins_over_wireless(root):
+    interface(root, 'enp3s0')
+    interface(root, 'wlan0', wireless=True)
+    state = network.read_network(str(root), addresses({'enp3s0': '10.0.0.2', 'wlan0': '10.0.0.3'}))
+    assert state == {'kind': 'ethernet', 'iface': 'enp3s0', 'ip': '10.0.0.2'}
+
+
+def test_link_without_address_does_not_count(root):
+    interface(root, 'enp3s0')
+    interface(root, 'wlan0', wireless=True)
+    state = network.read_network(str(root), addresses({'wlan0': '10.0.0.3'}))
+    assert state == {'kind': 'wifi', 'iface': 'wlan0', 'ip': '10.0.0.3'}
+
+
+def test_down_and_virtual_interfaces_are_skipped(root):
+    interface(root, 'enp3s0', operstate='down')
+    state = network.read_network(str(root), addresses({'enp3s0': '10.0.0.2', 'docker0': '172.17.0.1'}))
+    assert state == {'kind': None, 'iface': None, 'ip': None}
+    assert network.read_network(str(root / 'missing'))['kind'] is None
+
+
+class FakeResolver:
+
+    def __init__(self):
+        self.invalidated = 0
+
+    def invalidate(self):
+        self.invalidated += 1
+
+
+# Netlink messages only wake the provider up; a socketpair stands in for
+# the rtnetlink socket
+
+def test_netlink_burst_refreshes_once(root, monkeypatch):
+    fake_resolver = FakeResolver()
+    monkeypatch.setattr(network, 'resolver', fake_resolver)
+    monkeypatch.setattr(network, 'SETTLE_DELAY', 0.01)
+    table = {}
+    provider = network.NetworkProvider(str(root), addresses(table))
+    provider.nmcli = False
+    interface(root, 'wlan0', wireless=True)
+
+    async def main():
+        sock, kernel = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        provider._sock = sock
+        provider.loop.add_reader(sock.fileno(), provider._on_netlink)
+        shown = []
+        provider._subscribers.append(shown.append)
+        provider.refresh()
+        assert shown == [network.ICONS[None]]
+
+        table['wlan0'] = '192.168.1.20'
+        for _ in range(5):
+            kernel.send(b'RTM_NEWADDR')
+        await asyncio.sleep(0.1)
+        assert shown == [network.ICONS[None], network.ICONS['wifi']]
+        assert provider.state['iface'] == 'wlan0'
+        assert fake_resolver.invalidated == 1
+        provider.stop()
+        kernel.close()
+
+    asyncio.run(main())
+
+
+def test_missing_nmcli(root, monkeypatch):
+    monkeypatch.setattr(network, 'resolver', FakeResolver())
+    monkeypatch.setenv('PATH', str(root / 'empty'))
+    interface(root, 'wlan0', wireless=True)
+    provider = network.NetworkProvider(str(root), addresses({'wlan0': '192.168.1.20'}))
+
+    async def main():
+        provider.refresh()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert provider.state['iface'] == 'wlan0'
+    assert provider.ssid is None and provider.nmcli is False
@@ -0,0 +1,124 @@
+import asyncio
+import shutil
+import subprocess
+
+import pytest
+
+import notify
+
+dbus_next = pytest.importorskip('dbus_next')
+from dbus_next.aio import MessageBus  # noqa: E402
+from dbus_next.service import ServiceInterface, method  # noqa: E402
+
+
+@pytest.fixture
+def bus_address():
+    if shutil.which('dbus-daemon') is None:
+        pytest.skip("needs dbus-daemon")
+    daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address'],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        yield daemon.stdout.readline().decode().strip()
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+
+# A notification daemon that holds each reply until released, so a test
+# decides when a notification is no longer in flight
+
+class Notifications(ServiceInterface):
+
+    def __init__(self):
+        ServiceInterface.__init__(self, 'org.freedesktop.Notifications')
+        self.received = []
+        self.release = asyncio.Event()
+
+    @method()
+    async def Notify(self, app_name: 's', replaces_id: 'u', app_icon: 's', summary: 's',
+                     body: 's', actions: 'as', hints: 'a{sv}', timeout: 'i') -> 'u':
+        self.received.append((replaces_id, summary, hints['value'].value if 'value' in hints else None))
+        await self.release.wait()
+        return replaces_id or len(self.received)
+
+
+async def serve(address):
+    bus = await MessageBus(bus_address=address).connect()
+    service = Notifications()
+    bus.export('/org/freedesktop/Notifications', service)
+    await bus.request_name('org.freedesktop.Notifications')
+    return bus, service
+
+
+async def wait_for(condition, timeout=2):
+    deadline = asyncio.get_event_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_event_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def forks(monkeypatch):
+    commands = []
+    monkeypatch.setattr(notify.subprocess, 'Popen', commands.append)
+    return commands
+
+
+def test_replaces_id_sends_only_the_latest(bus_address, monkeypatch):
+    commands = forks(monkeypatch)
+
+    async def main():
+        bus, service = await serve(bus_address)
+        notifier = notify.Notifier(bus_address)
+        notifier.send("Volume: 50%", replaces_id=9993, value=50)
+        await wait_for(lambda: len(service.received) == 1)
+
+        # while the first is unanswered these overwrite each other
+        for percent in (55, 60, 65):
+            notifier.send("Volume: %d%%" % percent, replaces_id=9993, value=percent)
+        notifier.send("Brightness: 40%", replaces_id=5555, value=40)
+        await wait_for(lambda: len(service.received) == 2)
+        assert service.received[1] == (5555, "Brightness: 40%", 40)
+
+        service.release.set()
+        await wait_for(lambda: notifier.sent == 3)
+        assert [r for r in service.received if r[0] == 9993] == [
+            (9993, "Volume: 50%", 50), (9993, "Volume: 65%", 65)]
+        assert notifier.dropped == 2
+        bus.disconnect()
+
+    asyncio.run(main())
+    assert commands == []
+
+
+def test_no_notification_daemon_forks_dunstify(bus_address, monkeypatch):
+    commands = forks(monkeypatch)
+
+    async def main():
+        notifier = notify.Notifier(bus_address)
+        notifier.send("Screenshot Taken!")
+        await wait_for(lambda: commands)
+        assert notifier.sent == 0
+
+    asyncio.run(main())
+    assert commands == [['dunstify', '-a', 'qtile', '-t', '-1', 'Screenshot Taken!']]
+
+
+def test_unreachable_bus_forks_dunstify(tmp_path, monkeypatch):
+    commands = forks(monkeypatch)
+
+    async def main():
+        notifier = notify.Notifier('unix:path=%s' % (tmp_path / 'nobus'))
+        notifier.send("Volume: 30%", app_name="changevolume", replaces_id=9993,
+                      urgency='low', timeout=2000, value=30)
+        await wait_for(lambda: commands)
+
+    asyncio.run(main())
+    assert commands == [['dunstify', '-a', 'changevolume', '-t', '2000', '-r', '9993',
+                         '-u', 'low', '-h', 'int:value:30', 'Volume: 30%']]
+
+
+def test_without_dbus_next_forks_dunstify(monkeypatch):
+    commands = forks(monkeypatch)
+    monkeypatch.setattr(notify, 'MessageBus', None)
+    notify.Notifier().send("Muted", replaces_id=9993)
+    assert commands == [['dunstify', '-a', 'qtile', '-t', '-1', '-r', '9993', 'Muted']]
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import poll
+from source import Source
+
+
+class Counter(poll.PollSource):
+
+    def __init__(self, results, **config):
+        poll.PollSource.__init__(self, **config)
+        self.results = list(results)
+        self.polls = 0
+        self.release = asyncio.Event()
+
+    async def poll(self):
+        self.polls += 1
+        await self.release.wait()
+        result = self.results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+
+def test_refreshes_during_a_run_fold_into_one():
+    async def main():
+        source = Counter([1, 2, 3])
+        shown = []
+        source.subscribe(shown.append)
+        await asyncio.sleep(0)
+        for _ in range(5):
+            source.refresh()
+        source.release.set()
+        await asyncio.sleep(0.01)
+        assert source.polls == 2
+        assert shown == [1, 2]
+    asyncio.run(main())
+
+
+def test_failures_keep_the_last_good_value():
+    async def main():
+        source = Counter([1, OSError("gone"), 3], timeout=0.05)
+        source.release.set()
+        shown = []
+        source.subscribe(shown.append)
+        await asyncio.sleep(0.01)
+        source.refresh()
+        await asyncio.sleep(0.01)
+        assert source.value == 1 and shown == [1]
+
+        # a poll that hangs times out and keeps the value too
+        source.release.clear()
+        source.refresh()
+        await asyncio.sleep(0.1)
+        assert source.value == 1
+        source.release.set()
+        source.refresh()
+        await asyncio.sleep(0.01)
+        assert shown == [1, 3]
+    asyncio.run(main())
+
+
+def test_run_helper_timeout_and_exit_status():
+    async def main():
+        assert await poll.run(['sh', '-c', 'echo hi']) == 'hi\n'
+        try:
+            await poll.run(['sh', '-c', 'exit 3'])
+        except OSError as e:
+            assert 'exited with 3' in str(e)
+        else:
+            raise AssertionError
+        try:
+            await poll.run(['sleep', '5'], timeout=0.05)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError
+    asyncio.run(main())
+
+
+def test_broken_subscriber_does_not_stop_the_others():
+    source = Source()
+    shown = []
+
+    def broken(value):
+        raise ValueError(value)
+
+    source._subscribers += [broken, shown.append]
+    source.publish('x')
+    assert shown == ['x']
+
+
+def test_fresh_restored_value_skips_the_first_poll():
+    async def main():
+        source = Counter([2], interval=60)
+        source.release.set()
+        source.restore({'value': 1, 'updated': time.time() - 30})
+        shown = []
+        source.subscribe(shown.append)
+        await asyncio.sleep(0.01)
+        assert source.polls == 0 and shown == [1]
+        source.unsubscribe(shown.append)
+
+        # older than an interval, polled straight away
+        source.restore({'value': 1, 'updated': time.time() - 90})
+        source.subscribe(shown.append)
+        await asyncio.sleep(0.01)
+        assert source.polls == 1 and shown == [1, 1, 2]
+        source.unsubscribe(shown.append)
+    asyncio.run(main())
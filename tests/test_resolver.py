@@ -0,0 +1,191 @@
+import asyncio
+import socket
+import struct
+
+import pytest
+
+import resolver
+from resolver import Resolver, first_success, query_dns, query_http
+
+
+# A DNS server on localhost answering every question with one A record,
+# or with the first `truncate` bytes of that answer
+
+class DNSStub(asyncio.DatagramProtocol):
+
+    def __init__(self, address='198.51.100.7', truncate=None):
+        self.address = address
+        self.truncate = truncate
+        self.queries = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.queries += 1
+        qid, = struct.unpack_from('>H', data)
+        question = data[12:]
+        reply = (struct.pack('>HHHHHH', qid, 0x8180, 1, 1, 0, 0) + question
+                 + struct.pack('>HHHIH', 0xc00c, 1, 1, 60, 4)
+                 + socket.inet_aton(self.address))
+        self.transport.sendto(reply[:self.truncate], addr)
+
+
+async def dns_stub(**config):
+    stub = DNSStub(**config)
+    transport, _ = await asyncio.get_event_loop().create_datagram_endpoint(
+        lambda: stub, local_addr=('127.0.0.1', 0))
+    return stub, transport, transport.get_extra_info('sockname')
+
+
+# An HTTP server on localhost that sends the headers, then the body a bit
+# later, then closes the connection
+
+async def http_stub(body=b'203.0.113.9\n', status=b'200 OK', delay=0.05):
+    async def serve(reader, writer):
+        await reader.readuntil(b'\r\n\r\n')
+        writer.write(b'HTTP/1.0 ' + status + b'\r\nContent-Type: text/plain\r\n\r\n')
+        await writer.drain()
+        await asyncio.sleep(delay)
+        writer.write(body)
+        await writer.drain()
+        writer.close()
+    server = await asyncio.start_server(serve, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[:2]
+
+
+def test_query_dns():
+    async def main():
+        stub, transport, server = await dns_stub()
+        try:
+            assert await query_dns(server) == '198.51.100.7'
+        finally:
+            transport.close()
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('truncate', [2, 8, 20, 40])
+def test_short_dns_replies_fail(truncate):
+    async def main():
+        stub, transport, server = await dns_stub(truncate=truncate)
+        try:
+            with pytest.raises((ValueError, IndexError, struct.error)):
+                await query_dns(server)
+        finally:
+            transport.close()
+    asyncio.run(main())
+
+
+def test_query_http_reads_to_eof():
+    async def main():
+        server, address = await http_stub()
+        async with server:
+            assert await query_http(*address, '/ip') == '203.0.113.9'
+    asyncio.run(main())
+
+
+def test_query_http_errors():
+    async def main():
+        server, address = await http_stub(status=b'503 Service Unavailable')
+        async with server:
+            with pytest.raises(ValueError):
+                await query_http(*address, '/ip')
+        server, address = await http_stub(body=b'<html>')
+        async with server:
+            with pytest.raises(ValueError):
+                await query_http(*address, '/ip')
+    asyncio.run(main())
+
+
+def test_first_success():
+    async def fails():
+        raise OSError("unreachable")
+
+    async def hangs():
+        await asyncio.sleep(10)
+
+    async def answers(value, delay):
+        await asyncio.sleep(delay)
+        return value
+
+    async def main():
+        assert await first_success([fails(), answers('late', 0.05), answers('first', 0.01),
+                                    hangs()], 1) == 'first'
+        # empty answers don't count
+        assert await first_success([answers('', 0), answers('x', 0.02)], 1) == 'x'
+        assert await first_success([fails(), hangs()], 0.05) is None
+    asyncio.run(main())
+
+
+def test_first_success_with_a_short_reply():
+    async def main():
+        short, short_transport, short_server = await dns_stub(truncate=20)
+        good, good_transport, good_server = await dns_stub()
+        try:
+            assert await first_success(
+                [query_dns(short_server), query_dns(good_server)], 1) == '198.51.100.7'
+        finally:
+            short_transport.close()
+            good_transport.close()
+    asyncio.run(main())
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_cache_expires_and_follows_the_link(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resolver, 'time', clock)
+
+    async def main():
+        stub, transport, server = await dns_stub()
+        link = ['eth0', '192.168.1.2']
+        r = Resolver(path=str(tmp_path / 'cache.json'), dns_servers=[server],
+                     http_sources=[], link=lambda: link)
+        try:
+            assert await r.wan() == '198.51.100.7'
+            assert await r.wan() == '198.51.100.7'
+            assert stub.queries == 1
+
+            # the file is shared with other processes
+            other = Resolver(path=r.path, dns_servers=[], http_sources=[], link=lambda: link)
+            assert await other.wan() == '198.51.100.7'
+
+            clock.now += resolver.WAN_TTL + 1
+            await r.wan()
+            assert stub.queries == 2
+
+            # a link passed in wins over link(), and a new link empties the cache
+            await r.wan(link=['wlan0', '10.0.0.5'])
+            assert stub.queries == 3
+            await r.wan(link=['wlan0', '10.0.0.5'])
+            assert stub.queries == 3
+        finally:
+            transport.close()
+    asyncio.run(main())
+
+
+def test_failures_are_retried_soon(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resolver, 'time', clock)
+
+    async def main():
+        stub, transport, server = await dns_stub(truncate=8)
+        r = Resolver(path=str(tmp_path / 'cache.json'), dns_servers=[server],
+                     http_sources=[], timeout=0.5, link=lambda: ['eth0', '192.168.1.2'])
+        try:
+            assert await r.wan() is None
+            await r.wan()
+            assert stub.queries == 1
+            clock.now += resolver.FAILURE_TTL + 1
+            stub.truncate = None
+            assert await r.wan() == '198.51.100.7'
+        finally:
+            transport.close()
+    asyncio.run(main())
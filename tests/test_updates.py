@@ -0,0 +1,147 @@
+import io
+import os
+import tarfile
+import time
+
+import pytest
+
+import startup
+import updates
+from updates import UpdateIndex, read_local, read_sync, repositories, vercmp
+
+CONF = """\
+[options]
+HoldPkg = pacman glibc
+
+[core]
+Include = /etc/pacman.d/mirrorlist
+
+[extra]
+Include = /etc/pacman.d/mirrorlist
+"""
+
+
+def local_db(root, *entries):
+    local = os.path.join(root, 'local')
+    os.makedirs(local)
+    with open(os.path.join(local, 'ALPM_DB_VERSION'), 'w') as f:
+        f.write('9\n')
+    for entry in entries:
+        os.makedirs(os.path.join(local, entry))
+        with open(os.path.join(local, entry, 'desc'), 'w') as f:
+            f.write('%NAME%\n' + entry.rsplit('-', 2)[0] + '\n')
+
+
+def sync_db(root, repo, *entries, mode='w:gz'):
+    sync = os.path.join(root, 'sync')
+    os.makedirs(sync, exist_ok=True)
+    path = os.path.join(sync, repo + '.db')
+    with tarfile.open(path, mode) as db:
+        for entry in entries:
+            directory = tarfile.TarInfo(entry)
+            directory.type = tarfile.DIRTYPE
+            db.addfile(directory)
+            desc = b'%FILENAME%\n' + entry.encode() + b'-x86_64.pkg.tar.zst\n'
+            member = tarfile.TarInfo(entry + '/desc')
+            member.size = len(desc)
+            db.addfile(member, io.BytesIO(desc))
+    return path
+
+
+@pytest.fixture
+def pacman(tmp_path, monkeypatch):
+    monkeypatch.setattr(startup, 'CACHE_DIR', str(tmp_path / 'cache'))
+    root = str(tmp_path / 'pacman')
+    conf = str(tmp_path / 'pacman.conf')
+    with open(conf, 'w') as f:
+        f.write(CONF)
+    local_db(root, 'linux-6.1.1-1', 'vim-9.0.1-1', 'bash-5.2-2', 'only-local-1.0-1')
+    sync_db(root, 'core', 'linux-6.1.2-1', 'bash-5.2-2', 'vim-9.0.0-1')
+    sync_db(root, 'extra', 'vim-9.0.2-1', 'linux-6.2-1')
+    return root, conf
+
+
+@pytest.mark.parametrize('a, b, expected', [
+    ('1.0', '1.0', 0),
+    ('1.0a', '1.0', -1),
+    ('1.0.1', '1.0a', 1),
+    ('1.0', '1.0.1', -1),
+    ('1.10', '1.9', 1),
+    ('1.001', '1.1', 0),
+    ('1:1.0', '2.0', 1),
+    ('1:1.0', '2:0.1', -1),
+    ('1.0-2', '1.0-1', 1),
+    ('1.0-1', '1.0', 0),
+    ('1.0rc1-1', '1.0-1', -1),
+    ('2.0-1', '1.0-5', 1),
+])
+def test_vercmp(a, b, expected):
+    assert vercmp(a, b) == expected
+    assert vercmp(b, a) == -expected
+
+
+def test_read_local_and_sync(pacman):
+    root, _ = pacman
+    assert read_local(os.path.join(root, 'local')) == {
+        'linux': '6.1.1-1', 'vim': '9.0.1-1', 'bash': '5.2-2', 'only-local': '1.0-1'}
+    assert read_sync(os.path.join(root, 'sync', 'core.db')) == {
+        'linux': '6.1.2-1', 'bash': '5.2-2', 'vim': '9.0.0-1'}
+
+
+def test_read_sync_zstd(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    plain = sync_db(str(tmp_path), 'core', 'linux-6.1.2-1', mode='w')
+    with open(plain, 'rb') as f:
+        data = zstandard.ZstdCompressor().compress(f.read())
+    with open(plain, 'wb') as f:
+        f.write(data)
+    assert read_sync(plain) == {'linux': '6.1.2-1'}
+
+
+def test_repositories_follow_pacman_conf(pacman):
+    root, conf = pacman
+    sync_db(root, 'aaa-custom', 'thing-1-1')
+    assert repositories(conf, os.path.join(root, 'sync')) == ['core', 'extra', 'aaa-custom']
+
+
+# The first repository in pacman.conf with a package decides its version,
+# even when a later one has it newer
+
+def test_pending_updates(pacman):
+    root, conf = pacman
+    index = UpdateIndex(root, conf)
+    assert index.pending() == [('linux', '6.1.1-1', '6.1.2-1')]
+    assert index.parses == 3
+
+    # unchanged databases aren't parsed again, here or in a new index
+    index.pending()
+    assert index.parses == 3
+    again = UpdateIndex(root, conf)
+    assert again.pending() == [('linux', '6.1.1-1', '6.1.2-1')]
+    assert again.parses == 0
+
+
+def test_unreadable_database(pacman):
+    root, conf = pacman
+    with open(os.path.join(root, 'sync', 'core.db'), 'wb') as f:
+        f.write(b'not a tarball')
+    assert UpdateIndex(root, conf).pending() == [
+        ('linux', '6.1.1-1', '6.2-1'), ('vim', '9.0.1-1', '9.0.2-1')]
+
+
+def test_changed_since(pacman):
+    root, conf = pacman
+    index = UpdateIndex(root, conf)
+    later = time.time() + 10
+    assert not index.changed_since(later)
+    os.utime(os.path.join(root, 'sync', 'extra.db'), (later + 1, later + 1))
+    assert index.changed_since(later)
+
+
+def test_restored_count_is_kept_until_a_database_changes(pacman):
+    root, conf = pacman
+    source = updates.PacmanUpdates(root=root, conf=conf)
+    source.restore({'value': 1, 'updated': time.time() + 10})
+    assert source.fresh()
+    source.restore({'value': 1, 'updated': 0})
+    assert not source.fresh()
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import poll
+import volume
+
+
+# Stands in for the sound server behind pulsectl_asyncio: one sink, and a
+# queue of change events pushed to subscribe_events
+
+class FakePulse:
+
+    def __init__(self, server):
+        self.server = server
+
+    async def __aenter__(self):
+        self.server.connections += 1
+        if self.server.refuse:
+            self.server.refuse -= 1
+            raise ConnectionRefusedError("no server")
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def server_info(self):
+        return SimpleNamespace(default_sink_name='sink')
+
+    async def get_sink_by_name(self, name):
+        return SimpleNamespace(volume=SimpleNamespace(value_flat=self.server.volume),
+                               mute=self.server.muted)
+
+    async def subscribe_events(self, *facilities):
+        while True:
+            event = await self.server.events.get()
+            if event is None:
+                raise ConnectionResetError("server went away")
+            yield event
+
+    async def volume_set_all_chans(self, sink, value):
+        self.server.volume = value
+        self.server.requests.append(('volume', round(value * 100)))
+
+    async def mute(self, sink, muted):
+        self.server.muted = muted
+        self.server.requests.append(('mute', muted))
+
+
+class FakeServer:
+
+    def __init__(self, volume=0.4, muted=False, refuse=0):
+        self.volume = volume
+        self.muted = muted
+        self.refuse = refuse
+        self.connections = 0
+        self.requests = []
+        self.events = asyncio.Queue()
+
+    def PulseAsync(self, name, server=None):
+        return FakePulse(self)
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_subscribe_shows_server_events(monkeypatch):
+    async def main():
+        server = FakeServer()
+        monkeypatch.setattr(volume, 'pulsectl_asyncio', server)
+        monkeypatch.setattr(volume.notify, 'send', lambda *a, **k: None)
+        shown = []
+        source = volume.Volume()
+        source.subscribe(shown.append)
+        await settle()
+        assert source.volume == 40 and shown[-1].endswith('40%')
+
+        # a change made elsewhere arrives as an event
+        server.volume = 0.7
+        server.events.put_nowait('change')
+        await settle()
+        assert shown[-1].endswith('70%')
+
+        source.up()
+        await settle()
+        assert ('volume', 75) in server.requests and ('mute', False) in server.requests
+        assert shown[-1].endswith('75%')
+        source.unsubscribe(shown.append)
+    asyncio.run(main())
+
+
+def test_reconnects_after_losing_the_server(monkeypatch):
+    async def main():
+        server = FakeServer(refuse=1)
+        monkeypatch.setattr(volume, 'pulsectl_asyncio', server)
+        monkeypatch.setattr(volume, 'RECONNECT_DELAY', 0)
+        shown = []
+        source = volume.Volume()
+        source.subscribe(shown.append)
+        await settle()
+        assert server.connections == 2 and source.volume == 40
+
+        server.events.put_nowait(None)
+        server.volume = 0.2
+        await settle()
+        assert server.connections == 3 and shown[-1].endswith('20%')
+        source.unsubscribe(shown.append)
+    asyncio.run(main())
+
+
+def test_falls_back_to_pamixer(monkeypatch):
+    calls = []
+
+    async def run(argv, timeout=poll.DEFAULT_TIMEOUT, returncodes=(0,)):
+        calls.append(argv[1:])
+        return '55 false\n'
+
+    async def main():
+        monkeypatch.setattr(volume, 'pulsectl_asyncio', None)
+        monkeypatch.setattr(volume.poll, 'run', run)
+        monkeypatch.setattr(volume.notify, 'send', lambda *a, **k: None)
+        shown = []
+        source = volume.Volume()
+        source.subscribe(shown.append)
+        await settle()
+        assert source.volume == 55 and shown[-1].endswith('55%')
+
+        source.down()
+        await settle()
+        assert ['--unmute', '--allow-boost', '--set-volume', '50'] in calls
+    asyncio.run(main())
+
+
+# Against a real sound server: a private pulseaudio with only a null sink,
+# when pulseaudio and pulsectl_asyncio are installed
+
+@pytest.fixture
+def pulse_server(tmp_path):
+    if shutil.which('pulseaudio') is None:
+        pytest.skip("needs pulseaudio")
+    try:
+        import pulsectl_asyncio  # noqa: F401
+    except (ImportError, OSError):
+        pytest.skip("needs pulsectl_asyncio and libpulse")
+    socket_path = tmp_path / 'native'
+    env = dict(os.environ, HOME=str(tmp_path), XDG_RUNTIME_DIR=str(tmp_path))
+    server = subprocess.Popen(
+        ['pulseaudio', '--daemonize=no', '-n', '--use-pid-file=no', '--exit-idle-time=-1',
+         '-L', 'module-null-sink sink_name=null',
+         '-L', 'module-native-protocol-unix socket=%s auth-anonymous=1' % socket_path],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 5
+        while not socket_path.exists():
+            if server.poll() is not None or time.monotonic() > deadline:
+                pytest.skip("pulseaudio didn't start")
+            time.sleep(0.05)
+        yield 'unix:%s' % socket_path
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_against_pulseaudio(pulse_server, monkeypatch):
+    import pulsectl_asyncio
+    monkeypatch.setattr(volume, 'pulsectl_asyncio', pulsectl_asyncio)
+    monkeypatch.setattr(volume.notify, 'send', lambda *a, **k: None)
+
+    async def wait_for(condition):
+        for _ in range(100):
+            if condition():
+                return
+            await asyncio.sleep(0.02)
+        raise AssertionError("timed out")
+
+    async def main():
+        async with pulsectl_asyncio.PulseAsync('test', server=pulse_server) as pulse:
+            sink = await pulse.get_sink_by_name('null')
+            await pulse.volume_set_all_chans(sink, 0.4)
+
+            shown = []
+            source = volume.Volume(server=pulse_server)
+            source.subscribe(shown.append)
+            await wait_for(lambda: source.volume == 40)
+
+            # a change made by another client arrives as an event
+            await pulse.volume_set_all_chans(sink, 0.7)
+            await wait_for(lambda: shown and shown[-1].endswith('70%'))
+
+            source.up()
+            await wait_for(lambda: shown[-1].endswith('75%'))
+            sink = await pulse.get_sink_by_name('null')
+            assert round(sink.volume.value_flat * 100) == 75 and not sink.mute
+            source.unsubscribe(shown.append)
+
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+import pytest
+
+import wifi
+from timer import wheel
+
+SCAN = """\
+*:70:WPA2:home
+:40:WPA2:home
+:55:--:cafe\\:free
+:30::
+"""
+
+
+@pytest.fixture
+def nmcli(tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    script = bin_dir / 'nmcli'
+    script.write_text(
+        '#!/bin/sh\n'
+        'case "$*" in\n'
+        '  *general*) cat "%(dir)s/radio" ;;\n'
+        '  *"wifi list"*) cat "%(dir)s/scan" ;;\n'
+        '  *connection*) echo home ;;\n'
+        'esac\n' % {'dir': tmp_path})
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', str(bin_dir) + os.pathsep + os.environ['PATH'])
+
+    def set_state(scan, radio='enabled'):
+        (tmp_path / 'scan').write_text(scan)
+        (tmp_path / 'radio').write_text(radio + '\n')
+    set_state(SCAN)
+    return set_state
+
+
+def test_parse_scan():
+    assert wifi.parse_scan(SCAN) == [
+        ('home', 'WPA2', 70, True), ('cafe:free', '--', 55, False)]
+    assert [wifi.entry(n) for n in wifi.parse_scan(SCAN)] == [
+        wifi.LOCKED + "  home", wifi.OPEN + "  cafe:free"]
+
+
+# The interval doubles while the list stays the same, comes back down when
+# it changes, the link changes or the menu is opened, and stays on the wheel
+
+def test_interval_backs_off(tmp_path, nmcli):
+    async def main():
+        scanner = wifi.WifiScanner(path=str(tmp_path / 'cache.json'))
+        scanner.start()
+        await scanner._task
+        assert scanner.state['networks'][0] == ['home', 'WPA2', 70, True]
+        assert wifi.load(scanner.path) == scanner.state
+        assert scanner.interval == wifi.MIN_INTERVAL
+
+        intervals = []
+        for _ in range(6):
+            scanner.refresh()
+            await scanner._task
+            intervals.append(scanner.interval)
+        assert intervals == [30, 60, 120, 240, 300, 300]
+        assert [job[1] for job in wheel.jobs if job[2] == scanner.refresh] == [300]
+
+        nmcli(SCAN + ':20:WPA2:neighbour\n')
+        scanner.refresh()
+        await scanner._task
+        assert scanner.interval == wifi.MIN_INTERVAL
+
+        scanner.refresh()
+        await scanner._task
+        scanner.link_changed()
+        await scanner._task
+        # back to MIN_INTERVAL, then doubled once by the unchanged list read
+        assert scanner.interval == 30
+
+        scanner.refresh()
+        await scanner._task
+        scanner.menu_opened()
+        assert scanner.interval == wifi.MIN_INTERVAL
+        assert [job[1] for job in wheel.jobs if job[2] == scanner.refresh] == [15]
+        scanner.stop()
+        assert not any(job[2] == scanner.refresh for job in wheel.jobs)
+    asyncio.run(main())
+
+
+def test_disconnected_or_radio_off(tmp_path, nmcli):
+    async def main():
+        nmcli(':55:--:cafe\n')
+        scanner = wifi.WifiScanner(path=str(tmp_path / 'cache.json'))
+        for _ in range(5):
+            scanner.refresh()
+            await scanner._task
+        assert scanner.interval == wifi.DISCONNECTED_MAX
+
+        nmcli('', radio='disabled')
+        scanner.refresh()
+        await scanner._task
+        assert scanner.state['networks'] == [] and scanner.state['radio'] == 'disabled'
+        assert scanner.interval == wifi.DISCONNECTED_MAX
+    asyncio.run(main())